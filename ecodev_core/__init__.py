@@ -1,112 +1,135 @@
 """
 Module listing all public method from the ecodev_core modules
+
+NB: public names are lazily imported from their module on first access (PEP 562), so that importing
+ecodev_core does not import all of its (heavy) dependencies
 """
-from ecodev_core.app_activity import AppActivity
-from ecodev_core.app_activity import dash_monitor
-from ecodev_core.app_activity import fastapi_monitor
-from ecodev_core.app_activity import get_method
-from ecodev_core.app_activity import get_recent_activities
-from ecodev_core.app_rights import AppRight
-from ecodev_core.app_user import AppUser
-from ecodev_core.app_user import select_user
-from ecodev_core.app_user import upsert_app_users
-from ecodev_core.auth_configuration import AUTH
-from ecodev_core.authentication import attempt_to_log
-from ecodev_core.authentication import ban_token
-from ecodev_core.authentication import get_access_token
-from ecodev_core.authentication import get_app_services
-from ecodev_core.authentication import get_current_user
-from ecodev_core.authentication import get_user
-from ecodev_core.authentication import is_admin_user
-from ecodev_core.authentication import is_authorized_user
-from ecodev_core.authentication import is_banned
-from ecodev_core.authentication import is_monitoring_user
-from ecodev_core.authentication import JwtAuth
-from ecodev_core.authentication import safe_get_user
-from ecodev_core.authentication import SCHEME
-from ecodev_core.authentication import Token
-from ecodev_core.authentication import upsert_new_user
-from ecodev_core.backup import backup
-from ecodev_core.check_dependencies import check_dependencies
-from ecodev_core.check_dependencies import compute_dependencies
-from ecodev_core.custom_equal import custom_equal
-from ecodev_core.db_connection import create_db_and_tables
-from ecodev_core.db_connection import DB_URL
-from ecodev_core.db_connection import delete_table
-from ecodev_core.db_connection import engine
-from ecodev_core.db_connection import get_session
-from ecodev_core.db_connection import info_message
-from ecodev_core.db_filters import ServerSideFilter
-from ecodev_core.db_i18n import get_lang
-from ecodev_core.db_i18n import I18nMixin
-from ecodev_core.db_i18n import Lang
-from ecodev_core.db_i18n import localized_col
-from ecodev_core.db_i18n import set_lang
-from ecodev_core.db_insertion import generic_insertion
-from ecodev_core.db_insertion import get_raw_df
-from ecodev_core.db_retrieval import count_rows
-from ecodev_core.db_retrieval import get_rows
-from ecodev_core.db_retrieval import ServerSideField
-from ecodev_core.db_upsertion import add_missing_columns
-from ecodev_core.db_upsertion import add_missing_enum_values
-from ecodev_core.db_upsertion import field
-from ecodev_core.db_upsertion import filter_to_sfield_dict
-from ecodev_core.db_upsertion import get_sfield_columns
-from ecodev_core.db_upsertion import sfield
-from ecodev_core.db_upsertion import upsert_data
-from ecodev_core.db_upsertion import upsert_deletor
-from ecodev_core.db_upsertion import upsert_df_data
-from ecodev_core.db_upsertion import upsert_selector
-from ecodev_core.deployment import Deployment
-from ecodev_core.email_sender import send_email
-from ecodev_core.encryption import decrypt_value
-from ecodev_core.encryption import encrypt_value
-from ecodev_core.enum_utils import enum_converter
-from ecodev_core.list_utils import first_func_or_default
-from ecodev_core.list_utils import first_or_default
-from ecodev_core.list_utils import first_transformed_or_default
-from ecodev_core.list_utils import group_by
-from ecodev_core.list_utils import group_by_value
-from ecodev_core.list_utils import lselect
-from ecodev_core.list_utils import lselectfirst
-from ecodev_core.list_utils import sort_by_keys
-from ecodev_core.list_utils import sort_by_values
-from ecodev_core.logger import log_critical
-from ecodev_core.logger import logger_get
-from ecodev_core.pandas_utils import get_excelfile
-from ecodev_core.pandas_utils import get_value
-from ecodev_core.pandas_utils import is_null
-from ecodev_core.pandas_utils import jsonify_series
-from ecodev_core.pandas_utils import pd_equals
-from ecodev_core.pandas_utils import safe_drop_columns
-from ecodev_core.permissions import Permission
-from ecodev_core.pydantic_utils import Basic
-from ecodev_core.pydantic_utils import CustomFrozen
-from ecodev_core.pydantic_utils import Frozen
-from ecodev_core.pydantic_utils import OrmFrozen
-from ecodev_core.read_write import load_json_file
-from ecodev_core.read_write import load_yaml_file
-from ecodev_core.read_write import make_dir
-from ecodev_core.read_write import write_json_file
-from ecodev_core.rest_api_client import get_rest_api_client
-from ecodev_core.rest_api_client import handle_response
-from ecodev_core.rest_api_client import RestApiClient
-from ecodev_core.safe_utils import boolify
-from ecodev_core.safe_utils import datify
-from ecodev_core.safe_utils import floatify
-from ecodev_core.safe_utils import intify
-from ecodev_core.safe_utils import safe_clt
-from ecodev_core.safe_utils import SafeTestCase
-from ecodev_core.safe_utils import SimpleReturn
-from ecodev_core.safe_utils import stringify
-from ecodev_core.settings import SETTINGS
-from ecodev_core.settings import Settings
-from ecodev_core.token_banlist import TokenBanlist
-from ecodev_core.version import db_to_value
-from ecodev_core.version import get_row_versions
-from ecodev_core.version import get_versions
-from ecodev_core.version import Version
-from ecodev_core.sequence_utils import batch_sequence
+import sys
+from importlib import import_module
+from types import ModuleType
+from typing import Any
+
+_EXPORTS = {
+    'AppActivity': 'ecodev_core.app_activity',
+    'dash_monitor': 'ecodev_core.app_activity',
+    'fastapi_monitor': 'ecodev_core.app_activity',
+    'flush_activities': 'ecodev_core.app_activity',
+    'get_method': 'ecodev_core.app_activity',
+    'get_recent_activities': 'ecodev_core.app_activity',
+    'stream_recent_activities': 'ecodev_core.app_activity',
+    'upgrade_app_activity': 'ecodev_core.app_activity',
+    'AppRight': 'ecodev_core.app_rights',
+    'AppUser': 'ecodev_core.app_user',
+    'select_user': 'ecodev_core.app_user',
+    'upsert_app_users': 'ecodev_core.app_user',
+    'AUTH': 'ecodev_core.auth_configuration',
+    'attempt_to_log': 'ecodev_core.authentication',
+    'ban_token': 'ecodev_core.authentication',
+    'get_access_token': 'ecodev_core.authentication',
+    'get_app_services': 'ecodev_core.authentication',
+    'get_current_user': 'ecodev_core.authentication',
+    'get_user': 'ecodev_core.authentication',
+    'is_admin_user': 'ecodev_core.authentication',
+    'is_authorized_user': 'ecodev_core.authentication',
+    'is_banned': 'ecodev_core.authentication',
+    'is_monitoring_user': 'ecodev_core.authentication',
+    'JwtAuth': 'ecodev_core.authentication',
+    'safe_get_user': 'ecodev_core.authentication',
+    'SCHEME': 'ecodev_core.authentication',
+    'Token': 'ecodev_core.authentication',
+    'upsert_new_user': 'ecodev_core.authentication',
+    'backup': 'ecodev_core.backup',
+    'check_dependencies': 'ecodev_core.check_dependencies',
+    'compute_dependencies': 'ecodev_core.check_dependencies',
+    'custom_equal': 'ecodev_core.custom_equal',
+    'create_db_and_tables': 'ecodev_core.db_connection',
+    'DB_URL': 'ecodev_core.db_connection',
+    'delete_table': 'ecodev_core.db_connection',
+    'engine': 'ecodev_core.db_connection',
+    'get_engine': 'ecodev_core.db_connection',
+    'get_session': 'ecodev_core.db_connection',
+    'info_message': 'ecodev_core.db_connection',
+    'SessionLocal': 'ecodev_core.db_connection',
+    'ServerSideFilter': 'ecodev_core.db_filters',
+    'get_lang': 'ecodev_core.db_i18n',
+    'I18nMixin': 'ecodev_core.db_i18n',
+    'Lang': 'ecodev_core.db_i18n',
+    'localized_col': 'ecodev_core.db_i18n',
+    'set_lang': 'ecodev_core.db_i18n',
+    'generic_insertion': 'ecodev_core.db_insertion',
+    'get_raw_df': 'ecodev_core.db_insertion',
+    'count_rows': 'ecodev_core.db_retrieval',
+    'get_rows': 'ecodev_core.db_retrieval',
+    'get_page': 'ecodev_core.db_retrieval',
+    'ServerSideField': 'ecodev_core.db_retrieval',
+    'add_missing_columns': 'ecodev_core.db_upsertion',
+    'add_search_indexes': 'ecodev_core.db_upsertion',
+    'add_missing_enum_values': 'ecodev_core.db_upsertion',
+    'field': 'ecodev_core.db_upsertion',
+    'filter_to_sfield_dict': 'ecodev_core.db_upsertion',
+    'get_sfield_columns': 'ecodev_core.db_upsertion',
+    'sfield': 'ecodev_core.db_upsertion',
+    'upsert_data': 'ecodev_core.db_upsertion',
+    'upsert_data_trusted': 'ecodev_core.db_upsertion',
+    'upsert_deletor': 'ecodev_core.db_upsertion',
+    'upsert_deletor_many': 'ecodev_core.db_upsertion',
+    'upsert_df_data': 'ecodev_core.db_upsertion',
+    'upsert_selector': 'ecodev_core.db_upsertion',
+    'Deployment': 'ecodev_core.deployment',
+    'send_email': 'ecodev_core.email_sender',
+    'send_emails': 'ecodev_core.email_sender',
+    'decrypt_value': 'ecodev_core.encryption',
+    'encrypt_value': 'ecodev_core.encryption',
+    'decrypt_values': 'ecodev_core.encryption',
+    'encrypt_values': 'ecodev_core.encryption',
+    'enum_converter': 'ecodev_core.enum_utils',
+    'first_func_or_default': 'ecodev_core.list_utils',
+    'first_or_default': 'ecodev_core.list_utils',
+    'first_transformed_or_default': 'ecodev_core.list_utils',
+    'group_by': 'ecodev_core.list_utils',
+    'group_by_value': 'ecodev_core.list_utils',
+    'lselect': 'ecodev_core.list_utils',
+    'lselectfirst': 'ecodev_core.list_utils',
+    'sort_by_keys': 'ecodev_core.list_utils',
+    'sort_by_values': 'ecodev_core.list_utils',
+    'log_critical': 'ecodev_core.logger',
+    'logger_get': 'ecodev_core.logger',
+    'get_excelfile': 'ecodev_core.pandas_utils',
+    'get_value': 'ecodev_core.pandas_utils',
+    'is_null': 'ecodev_core.pandas_utils',
+    'jsonify_series': 'ecodev_core.pandas_utils',
+    'pd_equals': 'ecodev_core.pandas_utils',
+    'safe_drop_columns': 'ecodev_core.pandas_utils',
+    'Permission': 'ecodev_core.permissions',
+    'Basic': 'ecodev_core.pydantic_utils',
+    'CustomFrozen': 'ecodev_core.pydantic_utils',
+    'Frozen': 'ecodev_core.pydantic_utils',
+    'OrmFrozen': 'ecodev_core.pydantic_utils',
+    'load_json_file': 'ecodev_core.read_write',
+    'load_yaml_file': 'ecodev_core.read_write',
+    'make_dir': 'ecodev_core.read_write',
+    'write_json_file': 'ecodev_core.read_write',
+    'get_rest_api_client': 'ecodev_core.rest_api_client',
+    'handle_response': 'ecodev_core.rest_api_client',
+    'RestApiClient': 'ecodev_core.rest_api_client',
+    'boolify': 'ecodev_core.safe_utils',
+    'datify': 'ecodev_core.safe_utils',
+    'floatify': 'ecodev_core.safe_utils',
+    'intify': 'ecodev_core.safe_utils',
+    'safe_clt': 'ecodev_core.safe_utils',
+    'SafeTestCase': 'ecodev_core.safe_utils',
+    'SimpleReturn': 'ecodev_core.safe_utils',
+    'stringify': 'ecodev_core.safe_utils',
+    'SETTINGS': 'ecodev_core.settings',
+    'Settings': 'ecodev_core.settings',
+    'TokenBanlist': 'ecodev_core.token_banlist',
+    'TTLCache': 'ecodev_core.ttl_cache',
+    'db_to_value': 'ecodev_core.version',
+    'get_row_versions': 'ecodev_core.version',
+    'get_versions': 'ecodev_core.version',
+    'Version': 'ecodev_core.version',
+    'batch_sequence': 'ecodev_core.sequence_utils',
+}
 
 __all__ = [
     'AUTH', 'Token', 'get_app_services', 'attempt_to_log', 'get_current_user', 'is_admin_user',
@@ -127,4 +150,39 @@ __all__ = [
     'SETTINGS', 'add_missing_enum_values', 'ban_token', 'TokenBanlist', 'is_banned',
     'get_lang', 'set_lang', 'Lang', 'localized_col', 'I18nMixin', 'add_missing_columns',
     'encrypt_value', 'decrypt_value', 'get_rest_api_client', 'RestApiClient', 'handle_response',
-    'API_AUTH', 'batch_sequence']
+    'API_AUTH', 'batch_sequence', 'flush_activities', 'TTLCache',
+    'SessionLocal', 'stream_recent_activities', 'get_engine', 'get_page', 'send_emails',
+    'encrypt_values', 'decrypt_values', 'upsert_data_trusted',
+    'upsert_deletor_many', 'add_search_indexes', 'upgrade_app_activity']
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import on first access the passed public name, caching it in the module globals
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+class _PublicModule(ModuleType):
+    """
+    Module type preventing submodule imports (e.g. ecodev_core.backup) from shadowing the public
+    name they define (the backup method), as eager imports of this module used to do.
+    """
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if not (isinstance(value, ModuleType) and name in _EXPORTS):
+            super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _PublicModule
+
+
+def __dir__() -> list[str]:
+    """
+    List module attributes, including not yet imported public names
+    """
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,33 +1,66 @@
 """
 Module implementing a simple monitoring table
 """
-import inspect
+import atexit
+import sys
+from collections import deque
 from datetime import datetime
+from datetime import timezone
+from threading import Lock
+from threading import Timer
+from typing import Iterator
 from typing import Optional
+from typing import Union
 
+import pandas as pd
+from sqlalchemy import insert
 from sqlmodel import cast
 from sqlmodel import col
+from sqlmodel import Column
+from sqlmodel import DateTime
 from sqlmodel import extract
 from sqlmodel import Field
 from sqlmodel import func
+from sqlmodel import Index
 from sqlmodel import Integer
 from sqlmodel import select
 from sqlmodel import Session
 from sqlmodel import SQLModel
+from sqlmodel import text
 
 from ecodev_core.app_user import AppUser
 from ecodev_core.authentication import get_user
-from ecodev_core.db_connection import engine
+from ecodev_core.db_connection import SessionLocal
+from ecodev_core.logger import logger_get
 
+ACTIVITY_BUFFER_SIZE = 128
+ACTIVITY_FLUSH_DELAY = 0.1
+ACTIVITY_BATCH_SIZE = 500
+ACTIVITY_MAX_PENDING = 100 * ACTIVITY_BUFFER_SIZE
+log = logger_get(__name__)
+UPGRADE_ACTIVITY_QUERY = """
+DO $$ BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'app_activity'
+               AND column_name = 'created_at' AND data_type = 'timestamp without time zone') THEN
+        ALTER TABLE app_activity ALTER COLUMN created_at TYPE timestamptz
+            USING created_at AT TIME ZONE 'UTC';
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS ix_app_activity_created_at ON app_activity (created_at);
+CREATE INDEX IF NOT EXISTS app_activity_application_created_at
+    ON app_activity (application, created_at);
+"""
 
 """
 Simple helper to retrieve the method name in which this helper is called
 
-NB: this is meant to stay a lambda, otherwise the name retrieved is get_method, not the caller
+NB: this is meant to stay a lambda, otherwise the name retrieved is get_method, not the caller.
+Only the caller frame is looked at (no full stack walk nor source file reading as inspect.stack)
 """
 
 
-def get_method(): return inspect.stack()[1][3]
+def get_method(): return sys._getframe(1).f_code.co_name
 
 
 class AppActivityBase(SQLModel):
@@ -52,7 +85,86 @@ class AppActivity(AppActivityBase, table=True):  # type: ignore
     """
     __tablename__ = 'app_activity'
     id: Optional[int] = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),
+                                 sa_column=Column(DateTime(timezone=True), index=True,
+                                                  nullable=False))
+
+    __table_args__ = (
+        Index(
+            'app_activity_application_created_at',
+            'application',
+            'created_at'
+        ),
+    )
+
+
+class _ActivityBuffer:
+    """
+    Buffer accumulating AppActivity rows in memory, flushed to db in a single multi-row insert
+    either when ACTIVITY_BUFFER_SIZE rows are pending or ACTIVITY_FLUSH_DELAY seconds after the
+    first pending row was added (whichever comes first).
+    """
+
+    def __init__(self) -> None:
+        self._rows: deque[dict] = deque()
+        self._lock = Lock()
+        self._timer: Optional[Timer] = None
+
+    def add(self, row: dict) -> None:
+        """
+        Add a new row to the buffer, flushing it right away if it is full
+        """
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) < ACTIVITY_BUFFER_SIZE:
+                if self._timer is None:
+                    self._timer = Timer(ACTIVITY_FLUSH_DELAY, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Insert all pending rows in db with a single commit
+
+        NB: if the insertion fails, the error is logged and the rows put back in the buffer (at most
+        ACTIVITY_MAX_PENDING rows being kept, the oldest ones being dropped) to be retried on the
+        next flush
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows = list(self._rows)
+            self._rows.clear()
+        if not rows:
+            return
+        try:
+            with SessionLocal() as session:
+                session.execute(insert(AppActivity), rows)
+                session.commit()
+        except Exception:
+            log.exception(f'failed to insert {len(rows)} activities, keeping them for a retry')
+            with self._lock:
+                self._rows.extendleft(reversed(rows))
+                while len(self._rows) > ACTIVITY_MAX_PENDING:
+                    self._rows.popleft()
+
+
+ACTIVITY_BUFFER = _ActivityBuffer()
+
+
+def flush_activities() -> None:
+    """
+    Write in db all pending monitoring logs.
+
+    NB: automatically called at interpreter exit. Can also be registered as a fastapi shutdown hook.
+    """
+    ACTIVITY_BUFFER.flush()
+
+
+atexit.register(flush_activities)
 
 
 def dash_monitor(method: str,
@@ -68,9 +180,8 @@ def dash_monitor(method: str,
         - application: the application in which the user triggered the monitoring log
         - relevant_option: if filled, complementary information on method (num of treated lines...)
     """
-    with Session(engine) as session:
-        user = get_user(token.get('token', {}).get('access_token'))
-        add_activity_to_db(method, user, application, session, relevant_option)
+    user = get_user(token.get('token', {}).get('access_token'))
+    add_activity_to_db(method, user, application, relevant_option)
 
 
 def fastapi_monitor(method: str,
@@ -85,42 +196,84 @@ def fastapi_monitor(method: str,
         - method: the method called by the user  that triggered the monitoring log
         - user: the name of the user that triggered the monitoring log
         - application: the application in which the user triggered the monitoring log
-        - session: db connection
+        - session: db connection (unused, monitoring logs are buffered and written in batches)
         - relevant_option: if filled, complementary information on method (num of treated lines...)
     """
-    add_activity_to_db(method, user, application, session, relevant_option)
+    add_activity_to_db(method, user, application, relevant_option)
 
 
 def add_activity_to_db(method: str,
                        user: AppUser,
                        application: str,
-                       session: Session,
                        relevant_option: Optional[str] = None):
     """
-    Add a new entry in AppActivity given the passed arguments
+    Add a new entry in AppActivity given the passed arguments.
+
+    NB: the entry is buffered, see flush_activities to force its writing in db
     """
-    session.add(AppActivity(user=user.user, application=application, method=method,
-                            relevant_option=relevant_option))
-    session.commit()
+    ACTIVITY_BUFFER.add(AppActivity(user=user.user, application=application, method=method,
+                                    relevant_option=relevant_option).model_dump(exclude={'id'}))
 
 
-def get_recent_activities(last_date: str, session: Session) -> list[AppActivity]:
+def get_recent_activities(last_date: Union[datetime, str], session: Session) -> list[AppActivity]:
     """
     Returns all activities that happened after last_date
     """
-    return session.exec(select(AppActivity).where(col(AppActivity.created_at) > last_date)).all()
+    return list(stream_recent_activities(last_date, session))
+
+
+def stream_recent_activities(last_date: Union[datetime, str],
+                             session: Session,
+                             batch_size: int = ACTIVITY_BATCH_SIZE
+                             ) -> Iterator[AppActivity]:
+    """
+    Yields all activities that happened after last_date, fetched from the db batch_size at a time.
+
+    NB: rows are streamed through a server side cursor, so that large windows are never fully
+    held in memory. The session must stay open while iterating.
+    """
+    flush_activities()
+    yield from session.exec(select(AppActivity)
+                            .where(col(AppActivity.created_at) > _to_datetime(last_date))
+                            .execution_options(yield_per=batch_size))
 
 
-def get_monthly_activities(last_date: str, session: Session) -> dict[tuple[int, int], int]:
+def get_monthly_activities(last_date: Union[datetime, str],
+                           session: Session
+                           ) -> dict[tuple[int, int], int]:
     """
     Returns all activities that happened after last_date, grouped by year month.
     """
+    flush_activities()
     query = (select(
         cast(extract('year', AppActivity.created_at), Integer).label('year'),
         cast(extract('month', AppActivity.created_at), Integer).label('month'),
         func.count().label('count'))
-        .where(col(AppActivity.created_at) > last_date)
+        .where(col(AppActivity.created_at) > _to_datetime(last_date))
         .group_by(extract('year', AppActivity.created_at), extract('month', AppActivity.created_at))
         .order_by(extract('year', AppActivity.created_at), extract('month', AppActivity.created_at))
     )
     return dict(sorted(((year, month), value) for year, month, value in session.exec(query).all()))
+
+
+def upgrade_app_activity(session: Session) -> None:
+    """
+    Upgrade an app_activity table created by a previous version: convert its (naive, UTC) creation
+    dates to timezone aware timestamps, and create the creation date indexes.
+
+    NB: idempotent, meant to be called once on existing dbs (e.g. at deployment). Tables created
+    by create_db_and_tables are already up to date. The column conversion rewrites the table, and is
+    only done if the column is not yet timezone aware
+    """
+    session.execute(text(UPGRADE_ACTIVITY_QUERY))
+    session.commit()
+
+
+def _to_datetime(date: Union[datetime, str]) -> datetime:
+    """
+    Parse (once) the passed date so that it is bound as a timestamp and not cast for each db row.
+
+    NB: naive dates are considered to be UTC ones
+    """
+    parsed = date if isinstance(date, datetime) else pd.Timestamp(date).to_pydatetime()
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
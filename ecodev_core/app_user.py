@@ -3,11 +3,14 @@ Module implementing the sqlmodel orm part of the user table
 """
 from pathlib import Path
 from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
 from typing import TYPE_CHECKING
 
 import pandas as pd
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import col
 from sqlmodel import Field
 from sqlmodel import Relationship
@@ -16,10 +19,12 @@ from sqlmodel import Session
 from sqlmodel import SQLModel
 from sqlmodel.sql.expression import SelectOfScalar
 
-from ecodev_core.db_insertion import create_or_update
+from ecodev_core.db_insertion import has_unique_key
+from ecodev_core.db_insertion import insert_data
 from ecodev_core.db_insertion import Insertor
 from ecodev_core.permissions import Permission
 from ecodev_core.read_write import load_json_file
+from ecodev_core.ttl_cache import TTLCache
 
 
 if TYPE_CHECKING:  # pragma: no cover
@@ -32,18 +37,18 @@ class AppUser(SQLModel, table=True):  # type: ignore
     """
     __tablename__ = 'app_user'
     id: Optional[int] = Field(default=None, primary_key=True)
-    user: str = Field(index=True)
+    user: str = Field(index=True, unique=True)
     password: str
     permission: Permission = Field(default=Permission.ADMIN)
     client: Optional[str] = Field(default=None)
     rights: List['AppRight'] = Relationship(back_populates='user')
 
 
-def user_convertor(df: pd.DataFrame) -> List[Any]:
+def user_convertor(df: pd.DataFrame) -> List[Dict[str, Any]]:
     """
-    Dummy user convertor
+    Dummy user convertor: one plain dict per df row
     """
-    return [x for _, x in df.iterrows()]
+    return df.to_dict(orient='records')
 
 
 def user_reductor(in_db_row: AppUser,  db_row: AppUser) -> AppUser:
@@ -64,17 +69,38 @@ def user_selector(db_row: AppUser) -> SelectOfScalar:
     return select(AppUser).where(col(AppUser.user) == db_row.user)
 
 
+SELECT_USER_BY_NAME = select(AppUser).where(col(AppUser.user) == bindparam('username'))
 USER_INSERTOR = Insertor(convertor=user_convertor, selector=user_selector,
-                         reductor=user_reductor, db_schema=AppUser, read_excel_file=False)
+                         reductor=user_reductor, db_schema=AppUser, read_excel_file=False,
+                         key_fields=['user'], update_fields=['password', 'permission'])
+USER_CACHE = TTLCache(maxsize=4096, ttl=30)
 
 
 def upsert_app_users(file_path: Path, session: Session) -> None:
     """
     Upsert db users with a list of users provided in the file_path (json format)
+
+    NB: done in a single INSERT ... ON CONFLICT statement, relying on the unicity of user names
+    (on tables created before that unicity, lacking the unique index, users are upserted in batches
+    with USER_INSERTOR instead). As in user_reductor, only the password and the permission of
+    existing users are updated.
+    Passwords are expected already hashed in the file: no (costly) hashing is done here.
+    Cached authenticated users are invalidated, so that updated permissions apply at once.
     """
-    for user in load_json_file(file_path):
-        session.add(create_or_update(session, user, USER_INSERTOR))
-        session.commit()
+    users = {user['user']: AppUser(**user).model_dump(exclude={'id'})
+             for user in load_json_file(file_path)}
+    if not users:
+        return
+    if not has_unique_key(USER_INSERTOR, session):
+        insert_data(pd.DataFrame(list(users.values())), USER_INSERTOR, session)
+        USER_CACHE.clear()
+        return
+    query = insert(AppUser).values(list(users.values()))
+    session.execute(query.on_conflict_do_update(
+        index_elements=['user'],
+        set_={'password': query.excluded.password, 'permission': query.excluded.permission}))
+    session.commit()
+    USER_CACHE.clear()
 
 
 def select_user(username: str, session: Session) -> AppUser:
@@ -89,4 +115,4 @@ def select_user(username: str, session: Session) -> AppUser:
         sqlalchemy.exc.NoResultFound: Typical error is no users are found.
         sqlalchemy.exc.MultipleResultsFound: Should normally never be an issue.
     """
-    return session.exec(select(AppUser).where(col(AppUser.user) == username)).one()
+    return session.exec(SELECT_USER_BY_NAME, params={'username': username}).one()
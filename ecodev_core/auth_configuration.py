@@ -1,10 +1,61 @@
 """
 Module implementing authentication configuration.
+
+NB: the configuration is only resolved from the settings on first access to one of its attributes
 """
+from functools import cache
+from typing import Any
+
+from pydantic_settings import BaseSettings
+from pydantic_settings import SettingsConfigDict
+
 from ecodev_core.settings import SETTINGS
 
+_AUTH_ATTRIBUTES = {'SECRET_KEY': 'secret_key',
+                    'ALGO': 'algorithm',
+                    'EXPIRATION_LENGTH': 'access_token_expire_minutes'}
+
+
+class AuthenticationConfiguration(BaseSettings):
+    """
+    Authentication configuration, loaded from environment variables (or an .env file).
+
+    NB: values filled in the authentication section of the yaml settings take precedence
+    """
+    secret_key: str = ''
+    algorithm: str = 'HS256'
+    access_token_expire_minutes: int = 0
+    model_config = SettingsConfigDict(env_file='.env')
+
+
+@cache
+def get_auth() -> AuthenticationConfiguration:
+    """
+    Retrieve (once) the authentication configuration, from the settings if filled there and from
+    the environment otherwise
+
+    NB: raises a ValueError if no secret key or no positive token expiration is configured, tokens
+    otherwise being forgeable (empty signing key) or immediately expired
+    """
+    settings_auth = getattr(SETTINGS, 'authentication', None)
+    auth = AuthenticationConfiguration().model_copy(update={
+        field: value for field in AuthenticationConfiguration.model_fields
+        if (value := getattr(settings_auth, field, None)) is not None})
+    if not auth.secret_key:
+        raise ValueError('No authentication secret_key configured (neither in the yaml '
+                         'authentication settings nor in the environment)')
+    if auth.access_token_expire_minutes <= 0:
+        raise ValueError('The authentication access_token_expire_minutes must be positive, got '
+                         f'{auth.access_token_expire_minutes}')
+    return auth
+
 
-AUTH = SETTINGS.authentication  # type: ignore[attr-defined]
-SECRET_KEY = AUTH.secret_key
-ALGO = AUTH.algorithm
-EXPIRATION_LENGTH = AUTH.access_token_expire_minutes
+def __getattr__(name: str) -> Any:
+    """
+    Lazily resolve the AUTH, SECRET_KEY, ALGO and EXPIRATION_LENGTH module attributes
+    """
+    if name == 'AUTH':
+        return get_auth()
+    if name in _AUTH_ATTRIBUTES:
+        return getattr(get_auth(), _AUTH_ATTRIBUTES[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
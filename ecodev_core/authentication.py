@@ -1,43 +1,57 @@
 """
 Module implementing all jwt security logic
 """
+import hmac
+from contextlib import nullcontext
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from functools import cache
+from hashlib import blake2b
+from hashlib import sha256
+from secrets import token_bytes
 from typing import Any
+from typing import ContextManager
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Union
 
+import bcrypt
+import jwt
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
-from jose import JWTError
-from passlib.context import CryptContext
+from jwt import InvalidTokenError
 from sqladmin.authentication import AuthenticationBackend
+from sqlalchemy import bindparam
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import col
 from sqlmodel import select
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.responses import RedirectResponse
 
+from ecodev_core.app_rights import AppRight
 from ecodev_core.app_user import AppUser
-from ecodev_core.auth_configuration import ALGO
-from ecodev_core.auth_configuration import EXPIRATION_LENGTH
-from ecodev_core.auth_configuration import SECRET_KEY
-from ecodev_core.db_connection import engine
+from ecodev_core.app_user import SELECT_USER_BY_NAME
+from ecodev_core.app_user import USER_CACHE
+from ecodev_core.auth_configuration import get_auth
+from ecodev_core.db_connection import SessionLocal
 from ecodev_core.logger import logger_get
 from ecodev_core.permissions import Permission
 from ecodev_core.pydantic_utils import Frozen
 from ecodev_core.token_banlist import TokenBanlist
+from ecodev_core.ttl_cache import TTLCache
 
 SCHEME = OAuth2PasswordBearer(tokenUrl='login')
 auth_router = APIRouter(tags=['authentication'])
-CONTEXT = CryptContext(schemes=['bcrypt'], deprecated='auto')
+BCRYPT_ROUNDS = 12
 MONITORING = 'monitoring'
 MONITORING_ERROR = 'Could not validate credentials. You need to be the monitoring user to call this'
 INVALID_USER = 'Invalid User'
@@ -47,6 +61,23 @@ INVALID_CREDENTIALS = 'Invalid Credentials'
 REVOKED_TOKEN = 'This token has been revoked (by a logout action), please login again.'
 log = logger_get(__name__)
 INVALID_HASH = '$2b$12$pdH0b8fYDkXC41jXDa425e7xSbzJeNhHlCIuHpkaxHIcass5/Xkxe'
+PASSWORD_CACHE = TTLCache(maxsize=1024, ttl=60)
+PAYLOAD_CACHE = TTLCache(maxsize=10000, ttl=60)
+_PASSWORD_CACHE_KEY = token_bytes(32)
+DECODE_OPTIONS = {'require': ['exp']}
+SELECT_USER_BY_ID = select(AppUser).where(col(AppUser.id) == bindparam('user_id'))
+_PERMISSION_FILTER = col(AppUser.permission) == bindparam('permission')
+_NAME_FILTER = col(AppUser.user) == bindparam('username')
+SELECT_USER_WITH = {(False, False): SELECT_USER_BY_ID,
+                    (True, False): SELECT_USER_BY_ID.where(_PERMISSION_FILTER),
+                    (False, True): SELECT_USER_BY_ID.where(_NAME_FILTER),
+                    (True, True): SELECT_USER_BY_ID.where(_PERMISSION_FILTER, _NAME_FILTER)}
+SELECT_APP_SERVICES = select(AppRight.app_service).where(
+    col(AppRight.user_id) == bindparam('user_id'))
+SELECT_BANNED_TOKEN = select(TokenBanlist.token).where(
+    col(TokenBanlist.token) == bindparam('token'))
+DELETE_OLD_BANNED_TOKENS = delete(TokenBanlist).where(
+    col(TokenBanlist.created_at) <= bindparam('threshold'))
 
 
 class Token(Frozen):
@@ -68,19 +99,16 @@ def get_access_token(token: Dict[str, Any]) -> str | None:
     """
     Robust method to return access token or None
     """
-    try:
-        return token.get('token', {}).get('access_token')
-    except AttributeError:
-        return None
+    if isinstance(token, dict) and isinstance(inner_token := token.get('token'), dict):
+        return inner_token.get('access_token')
+    return None
 
 
 def get_app_services(user: AppUser, session: Session) -> List[str]:
     """
     Retrieve all app services the passed user has access to
     """
-    if db_user := session.exec(select(AppUser).where(col(AppUser.id) == user.id)).first():
-        return [right.app_service for right in db_user.rights]
-    return []
+    return list(session.exec(SELECT_APP_SERVICES, params={'user_id': user.id}))
 
 
 class JwtAuth(AuthenticationBackend):
@@ -93,7 +121,7 @@ class JwtAuth(AuthenticationBackend):
         Login procedure: factorized with the fastapi jwt logic
         """
         form = await request.form()
-        if token := self.authorized(form):
+        if token := await run_in_threadpool(self.authorized, form):
             request.session.update(token)
         return True if token else False
 
@@ -101,7 +129,7 @@ class JwtAuth(AuthenticationBackend):
         """
         Check that the user information contained in the form corresponds to an admin user
         """
-        with Session(engine) as session:
+        with SessionLocal() as session:
             try:
                 return self.admin_token(form, session)
             except HTTPException:
@@ -111,21 +139,26 @@ class JwtAuth(AuthenticationBackend):
         """
         Unsafe attempt to retrieve the token, only return it if admin rights
         """
-        token = attempt_to_log(form.get('username', ''), form.get('password', ''), session)
-        return token if is_admin_user(token['access_token']) else None
+        token, db_user = _log_user(form.get('username', ''), form.get('password', ''), session)
+        return token if db_user.permission == Permission.ADMIN else None
 
     async def logout(self, request: Request) -> bool:
         """
         Logout procedure: clears the cache
         """
+        if token := request.session.get('access_token'):
+            invalidate_token(token)
         request.session.clear()
         return True
 
     async def authenticate(self, request: Request) -> Optional[RedirectResponse]:
         """
         Authentication procedure
+
+        NB: the blocking db checks are run in the threadpool so as not to stall the event loop
         """
-        return (token := request.session.get('access_token')) and is_admin_user(token)
+        return ((token := request.session.get('access_token'))
+                and await run_in_threadpool(is_admin_user, token))
 
 
 def attempt_to_log(user: str,
@@ -146,35 +179,21 @@ def attempt_to_log(user: str,
         session: db connection
         tfa_value: if filled, add it encoded to the generated token
     """
-    selector = select(AppUser).where(col(AppUser.user) == user)
-    login_failed = False
-
-    if not (db_user := session.exec(selector).first()):
-        log.warning('unauthorized user')
-        login_failed = True
-
-    if not _check_password(password, db_user.password if db_user and db_user.password else INVALID_HASH):
-        log.warning('invalid user')
-        login_failed = True
-
-    if login_failed:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=INVALID_CREDENTIALS)
-
-    return {'access_token': _create_access_token(data={'user_id': db_user.id}, tfa_value=tfa_value),
-            'token_type': 'bearer'}
+    return _log_user(user, password, session, tfa_value)[0]
 
 
 def is_authorized_user(token: str = Depends(SCHEME)) -> bool:
     """
     Check if the passed token corresponds to an authorized user
     """
-    if is_banned(token):
-        return False
+    with SessionLocal() as session:
+        if is_banned(token, session):
+            return False
 
-    try:
-        return get_current_user(token) is not None
-    except Exception:
-        return False
+        try:
+            return get_current_user(token, session=session) is not None
+        except Exception:
+            return False
 
 
 def safe_get_user(token: Dict, tfa_check: bool = False) -> Union[AppUser, None]:
@@ -193,10 +212,12 @@ def get_user(token: str = Depends(SCHEME),
     """
     Retrieves (if it exists) the db user corresponding to the passed token
     """
-    if is_banned(token):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
-                            headers={'WWW-Authenticate': 'Bearer'})
-    if user := get_current_user(token, tfa_value, tfa_check):
+    with SessionLocal() as session:
+        if is_banned(token, session):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
+                                headers={'WWW-Authenticate': 'Bearer'})
+        user = get_current_user(token, tfa_value, tfa_check, session)
+    if user:
         return user
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_CREDENTIALS,
                         headers={'WWW-Authenticate': 'Bearer'})
@@ -208,44 +229,65 @@ def ban_token(token: str, session: Session) -> None:
     """
     session.add(TokenBanlist(token=token))
     session.commit()
+    invalidate_token(token)
+
+
+def invalidate_token(token: str) -> None:
+    """
+    Forget the decoded payload and the user cached for the passed token
+    """
+    PAYLOAD_CACHE.pop(token)
+    USER_CACHE.pop(token)
 
 
-def is_banned(token: str) -> bool:
+def is_banned(token: str, session: Optional[Session] = None) -> bool:
     """
     Check if the passed token is banned.
 
-    NB: Clean the TokenBanlist table (deleting old entries) on the fly
+    NB: Clean the TokenBanlist table (deleting old entries) on the fly, committing the passed
+    session if any (a dedicated one being opened otherwise)
     """
-    with Session(engine) as session:
-        threshold = datetime.now() - timedelta(minutes=EXPIRATION_LENGTH)
-        for token_banned in session.exec(
-                select(TokenBanlist).where(TokenBanlist.created_at <= threshold)).all():
-            session.delete(token_banned)
+    with _session_scope(session) as session:
+        session.execute(DELETE_OLD_BANNED_TOKENS,
+                        params={'threshold': datetime.now() - _get_expiration_delta()})
         session.commit()
-        return token in session.exec(select(TokenBanlist.token)).all()
+        return session.exec(SELECT_BANNED_TOKEN, params={'token': token}).first() is not None
 
 
 def get_current_user(token: str,
                      tfa_value: Optional[str] = None,
-                     tfa_check: bool = False
+                     tfa_check: bool = False,
+                     session: Optional[Session] = None
                      ) -> Union[AppUser, None]:
     """
     Retrieves (if it exists) a valid (meaning who has valid credentials) user from the db
+
+    NB: users retrieved without tfa check are cached by token for a few seconds (never beyond
+    the token expiration) so that several auth dependencies of a same request hit the db only once.
+    The passed session is used if any, a dedicated one being opened otherwise. A detached copy of
+    the user is cached, never the instance attached to that session (which could be expired on its
+    commit, and is not to be shared across requests and threads).
     """
-    token = _verify_access_token(token, tfa_value, tfa_check)
-    with Session(engine) as session:
-        return session.exec(select(AppUser).where(col(AppUser.id) == token.id)).first()
+    if not tfa_check and (user := USER_CACHE.get(token)):
+        return user
+    token_data = _verify_access_token(token, tfa_value, tfa_check)
+    with _session_scope(session) as session:
+        user = session.get(AppUser, token_data.id)
+        if user and not tfa_check:
+            USER_CACHE.set(token, AppUser.model_validate(user), expire_at=_get_expiration(token))
+    return user
 
 
 def is_admin_user(token: str = Depends(SCHEME)) -> AppUser:
     """
     Retrieves (if it exists) the admin (meaning who has valid credentials) user from the db
     """
-    if is_banned(token):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
-                            headers={'WWW-Authenticate': 'Bearer'})
-
-    if (user := get_current_user(token)) and user.permission == Permission.ADMIN:
+    with SessionLocal() as session:
+        if is_banned(token, session):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
+                                headers={'WWW-Authenticate': 'Bearer'})
+        user = _get_user_with_permission(token, session, perm=Permission.ADMIN)
+    if user:
         return user
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=ADMIN_ERROR,
                         headers={'WWW-Authenticate': 'Bearer'})
@@ -255,11 +297,12 @@ def is_monitoring_user(token: str = Depends(SCHEME)) -> AppUser:
     """
     Retrieves (if it exists) the monitoring user from the db
     """
-    if is_banned(token):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
-                            headers={'WWW-Authenticate': 'Bearer'})
-
-    if (user := get_current_user(token)) and user.user == MONITORING:
+    with SessionLocal() as session:
+        if is_banned(token, session):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=REVOKED_TOKEN,
+                                headers={'WWW-Authenticate': 'Bearer'})
+        user = _get_user_with_permission(token, session, user_filter=MONITORING)
+    if user:
         return user
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                         detail=MONITORING_ERROR, headers={'WWW-Authenticate': 'Bearer'})
@@ -269,14 +312,76 @@ def upsert_new_user(token: str, user: str, password: str = '') -> None:
     """
     Upsert a new user if not already present in db.
 
-    NB: this method RAISES a http error if he token is invalid
+    NB: this method RAISES a http error if he token is invalid. The existence check and the
+    insertion are done in a single INSERT ... ON CONFLICT DO NOTHING statement, covering both the
+    id and the (unique) user name conflicts
+    """
+    new_user = AppUser(user=user, password=password, permission=Permission.Consultant,
+                       id=_verify_access_token(token).id)
+    with SessionLocal() as session:
+        session.execute(insert(AppUser).values(new_user.model_dump())
+                        .on_conflict_do_nothing())
+        session.commit()
+    USER_CACHE.pop(token)
+
+
+def _get_user_with_permission(token: str,
+                              session: Session,
+                              perm: Optional[Permission] = None,
+                              user_filter: Optional[str] = None
+                              ) -> Union[AppUser, None]:
     """
-    user_id = _verify_access_token(token).id
-    with Session(engine) as session:
-        if not session.exec(select(AppUser).where(col(AppUser.id) == user_id)).first():
-            session.add(AppUser(user=user, password=password, permission=Permission.Consultant,
-                                id=user_id))
-            session.commit()
+    Retrieves (if it exists) the valid user matching the token, provided that he has the perm
+    permission and the user_filter name (when these are passed).
+
+    NB: on a user cache miss, the permission and name checks are done by the db, which returns
+    no row at all for a user not matching them. As in get_current_user, a detached validated copy
+    of the user is cached, never the session bound db row
+    """
+    if user := USER_CACHE.get(token):
+        return user if ((perm is None or user.permission == perm)
+                        and (user_filter is None or user.user == user_filter)) else None
+    params = {'user_id': _verify_access_token(token).id, 'permission': perm,
+              'username': user_filter}
+    user = session.exec(SELECT_USER_WITH[perm is not None, user_filter is not None],
+                        params={key: value for key, value in params.items() if value is not None}
+                        ).first()
+    if user:
+        USER_CACHE.set(token, AppUser.model_validate(user), expire_at=_get_expiration(token))
+    return user
+
+
+def _session_scope(session: Optional[Session]) -> ContextManager[Session]:
+    """
+    Context manager yielding the passed session if any (left open on exit), a new one otherwise
+    """
+    return nullcontext(session) if session is not None else SessionLocal()
+
+
+def _log_user(user: str,
+              password: str,
+              session: Session,
+              tfa_value: Optional[str] = None
+              ) -> Tuple[Dict, AppUser]:
+    """
+    Implementation of attempt_to_log, also returning the logged db user so that callers needing
+    its rights do not have to decode the generated token and query the db again
+    """
+    login_failed = False
+
+    if not (db_user := session.exec(SELECT_USER_BY_NAME, params={'username': user}).first()):
+        log.warning('unauthorized user')
+        login_failed = True
+
+    if not _check_password(password, db_user.password if db_user and db_user.password else INVALID_HASH):
+        log.warning('invalid user')
+        login_failed = True
+
+    if login_failed or not db_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=INVALID_CREDENTIALS)
+
+    return {'access_token': _create_access_token(data={'user_id': db_user.id}, tfa_value=tfa_value),
+            'token_type': 'bearer'}, db_user
 
 
 def _create_access_token(data: Dict, tfa_value: Optional[str] = None) -> str:
@@ -284,11 +389,11 @@ def _create_access_token(data: Dict, tfa_value: Optional[str] = None) -> str:
     Create an access token out of the passed data. Only called if credentials are valid
     """
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=EXPIRATION_LENGTH)
+    expire = datetime.now(timezone.utc) + _get_expiration_delta()
     to_encode['exp'] = expire
     if tfa_value:
-        to_encode['tfa'] = _hash_password(tfa_value)
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGO)
+        to_encode['tfa'] = _tfa_digest(tfa_value)
+    return jwt.encode(to_encode, _get_secret_bytes(), algorithm=get_auth().algorithm)
 
 
 def _verify_access_token(token: str,
@@ -298,28 +403,118 @@ def _verify_access_token(token: str,
     Retrieves the token data associated to the passed token if it contains valid credential info.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGO])
-        if tfa_check and (not tfa_value or not _check_password(tfa_value, payload.get('tfa'))):
+        payload = _decode_token(token)
+        if tfa_check and not _check_tfa(tfa_value, payload.get('tfa')):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_TFA,
                                 headers={'WWW-Authenticate': 'Bearer'})
         if (user_id := payload.get('user_id')) is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_USER,
                                 headers={'WWW-Authenticate': 'Bearer'})
         return TokenData(id=user_id)
-    except JWTError as e:
+    except InvalidTokenError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_CREDENTIALS,
                             headers={'WWW-Authenticate': 'Bearer'}) from e
 
 
+def _decode_token(token: str) -> Dict[str, Any]:
+    """
+    Decodes (and checks the signature and expiration of) the passed token.
+
+    NB: decoded payloads are cached by token for a few seconds (never beyond the token expiration)
+    so that the signature is only checked once for a burst of requests with the same token
+    """
+    if (payload := PAYLOAD_CACHE.get(token)) is None:
+        payload = jwt.decode(token, _get_secret_bytes(), algorithms=[get_auth().algorithm],
+                             options=DECODE_OPTIONS)
+        PAYLOAD_CACHE.set(token, payload, expire_at=payload.get('exp'))
+    return payload
+
+
+def _get_expiration(token: str) -> Optional[float]:
+    """
+    Retrieves the expiration timestamp of an already verified token.
+    """
+    return _decode_token(token).get('exp')
+
+
+def _tfa_digest(tfa_value: str) -> str:
+    """
+    Keyed digest of the passed tfa value, as stored in the access token.
+
+    NB: a (cheap) HMAC is enough here, contrary to passwords: the token signature already
+    prevents any tampering with the digest, which is checked on every tfa verified request.
+    The keyed HMAC state is computed once and copied for each digest
+    """
+    digest = _get_tfa_hmac().copy()
+    digest.update(tfa_value.encode())
+    return digest.hexdigest()
+
+
+@cache
+def _get_secret_bytes() -> bytes:
+    """
+    Retrieve (once, on first token operation) the encoded token signing key
+    """
+    return get_auth().secret_key.encode('utf-8')
+
+
+@cache
+def _get_tfa_hmac() -> Any:
+    """
+    Retrieve (once) the keyed tfa HMAC state.
+
+    NB: its key is derived from (and never equal to) the token signing key, so that tfa digests
+    can never be used as an oracle to sign tokens
+    """
+    return hmac.new(hmac.new(_get_secret_bytes(), b'tfa', sha256).digest(), digestmod=sha256)
+
+
+@cache
+def _get_expiration_delta() -> timedelta:
+    """
+    Retrieve (once) the access token lifetime
+    """
+    return timedelta(minutes=get_auth().access_token_expire_minutes)
+
+
+def _check_tfa(tfa_value: Optional[str], tfa_digest: Optional[str]) -> bool:
+    """
+    Check (in constant time) the passed tfa value against the digest stored in the access token
+    """
+    return bool(tfa_value and hmac.compare_digest(_tfa_digest(tfa_value), tfa_digest or ''))
+
+
 def _hash_password(password: str) -> str:
     """
     Hashes the passed password (encoding).
     """
-    return CONTEXT.hash(password)
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 
 def _check_password(plain_password: Optional[str], hashed_password: str) -> bool:
     """
     Check the passed password (compare it to the passed encoded one).
+
+    NB: results are cached for a minute, keyed by a (per process salted) digest of both passwords,
+    to spare bcrypt rounds on repeated attempts. A password change yields a new hash, hence a new
+    cache key
     """
-    return CONTEXT.verify(plain_password, hashed_password)
+    key = blake2b(repr((plain_password, hashed_password)).encode(),
+                  key=_PASSWORD_CACHE_KEY).digest()
+    if (checked := PASSWORD_CACHE.get(key)) is None:
+        checked = _bcrypt_check(plain_password, hashed_password)
+        PASSWORD_CACHE.set(key, checked)
+    return checked
+
+
+def _bcrypt_check(plain_password: Optional[str], hashed_password: Optional[str]) -> bool:
+    """
+    Check the passed password against the passed bcrypt hash. Missing or malformed values never
+    match.
+    """
+    if not plain_password or not hashed_password:
+        return False
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except ValueError:
+        return False
@@ -2,12 +2,19 @@
 Module implementing backup mechanism on a ftp server.
 """
 import tarfile
+from contextlib import contextmanager
+from contextlib import suppress
 from datetime import datetime
+from ftplib import FTP
+from os import cpu_count
 from pathlib import Path
+from shutil import which
+from subprocess import CalledProcessError
 from subprocess import PIPE
 from subprocess import Popen
-from subprocess import run
-from subprocess import STDOUT
+from tempfile import TemporaryFile
+from typing import BinaryIO
+from typing import Iterator
 from typing import List
 
 from ecodev_core.db_connection import DB_URL
@@ -17,83 +24,137 @@ from ecodev_core.settings import SETTINGS
 log = logger_get(__name__)
 
 
-def get_backup_url():
-    bck_settings = SETTINGS.backup
-
-    user = bck_settings.backup_username
-    password = bck_settings.backup_password
-    url = bck_settings.get_backup_url()
-    return f'ftp://{user}:{password}@{url}'
-
-
 def backup(backed_folders: dict[str, Path],
            nb_saves: int = 5,
            additional_id: str = 'default',
            backup_db: bool = False) -> None:
     """
     Backup db and backed_folder: write the dump/tar on the backup server and erase old copies
+
+    NB: a single ftp connection is used for all transfers and deletions. Dumps and tars are
+    streamed to the server, without ever being written on the local disk
     """
     timestamp = datetime.now().strftime('%Y_%m_%d_%Hh_%Mmn_%Ss')
-    for backup_name, backup_folder in backed_folders.items():
-        dump_path = Path.cwd() / f'{backup_name}.{timestamp}.tgz'
-        _backup_files(backup_folder, dump_path, nb_saves)
-    if backup_db:
-        _backup_db(Path.cwd() / f'{additional_id}_db.{timestamp}.dump', nb_saves)
+    with _ftp_connection() as ftp:
+        for backup_name, backup_folder in backed_folders.items():
+            _backup_files(ftp, backup_folder, f'{backup_name}.{timestamp}.tgz', nb_saves)
+        if backup_db:
+            _backup_db(ftp, f'{additional_id}_db.{timestamp}.dump', nb_saves)
 
 
 def retrieve_most_recent_backup(name: str = 'default_files') -> None:
     """
     Retrieve from backup server the most recent backup of the name family.
     """
-    output = run(['lftp', '-c', f'open {get_backup_url()}; ls'], capture_output=True, text=True)
-    all_backups = sorted([x.split(' ')[-1] for x in output.stdout.splitlines() if name in x])
-    log.info(f'most recent backup {all_backups[-1]}')
-    run(['lftp', '-c', f'open {get_backup_url()}; get {all_backups[-1]}'])
+    with _ftp_connection() as ftp:
+        all_backups = sorted(x for x in ftp.nlst() if name in x)
+        log.info(f'most recent backup {all_backups[-1]}')
+        with open(Path.cwd() / all_backups[-1], 'wb') as f_stream:
+            ftp.retrbinary(f'RETR {all_backups[-1]}', f_stream.write)
     return None
 
 
-def _backup_db(db_dump_path: Path, nb_saves: int) -> None:
+@contextmanager
+def _ftp_connection() -> Iterator[FTP]:
     """
-    Pg_dump of DB_URL db andwrite on the backup server
+    Open (and log in) an ftp connection to the backup server, cd-ing in the backup folder if any
+    """
+    bck_settings = SETTINGS.backup  # type: ignore[attr-defined]
+    host, _, folder = bck_settings.backup_url.partition('/')
+    hostname, _, port = host.partition(':')
+    with FTP() as ftp:
+        ftp.connect(hostname, int(port or 21))
+        ftp.login(bck_settings.backup_username, bck_settings.backup_password)
+        if folder:
+            ftp.cwd(folder)
+        yield ftp
+
+
+@contextmanager
+def _ftp_upload(ftp: FTP, filename: str) -> Iterator[BinaryIO]:
+    """
+    Writable stream to filename on the backup server (through the ftp data connection)
+
+    NB: the transfer response is read even if the upload fails, so that the (partial) file can
+    then be deleted on the same connection
     """
-    process = Popen(['pg_dump', f'--dbname={DB_URL}', '-f', db_dump_path.name],
-                    stdout=PIPE, stderr=STDOUT, cwd=db_dump_path.parent)
-    if not (process_output := process.communicate()[0]):
-        _backup_content(db_dump_path, nb_saves)
-    else:
-        log.critical(f'something went wrong : {process_output}')
+    try:
+        with ftp.transfercmd(f'STOR {filename}') as conn, conn.makefile('wb') as f_stream:
+            yield f_stream
+    finally:
+        ftp.voidresp()
 
 
-def _backup_files(backed_folder: Path, backup_file: Path, nb_saves: int) -> None:
+def _backup_db(ftp: FTP, dump_name: str, nb_saves: int) -> None:
+    """
+    Pg_dump of DB_URL db streamed to the backup server
+
+    NB: if pg_dump fails, the partial dump is deleted and old copies are kept
+    """
+    log.warning(f'Transferring backup to server: {dump_name}')
+    with TemporaryFile() as errors:
+        with _ftp_upload(ftp, dump_name) as f_stream:
+            return_code = Popen(['pg_dump', f'--dbname={DB_URL}'], stdout=f_stream,
+                                stderr=errors).wait()
+        if return_code:
+            errors.seek(0)
+            log.critical(f'something went wrong : {errors.read()}')
+            ftp.delete(dump_name)
+            return
+    _delete_old_backups(ftp, dump_name, nb_saves)
+
+
+def _backup_files(ftp: FTP, backed_folder: Path, backup_name: str, nb_saves: int) -> None:
+    """
+    Zip backed_folder and stream it to the backup server
+
+    NB: the compression is done on all cores by pigz if available, by tarfile otherwise. If pigz
+    fails, the partial tar is deleted and old copies are kept
+    """
+    log.warning(f'Transferring backup to server: {backup_name}')
+    try:
+        with _ftp_upload(ftp, backup_name) as f_stream:
+            if which('pigz'):
+                _parallel_tar(backed_folder, f_stream)
+            else:
+                with tarfile.open(fileobj=f_stream, mode='w|gz') as tar:
+                    tar.add(backed_folder, arcname=backed_folder.name)
+    except CalledProcessError as error:
+        log.critical(f'pigz failed to compress {backed_folder}: {error}')
+        ftp.delete(backup_name)
+        return
+    _delete_old_backups(ftp, backup_name, nb_saves)
+
+
+def _parallel_tar(backed_folder: Path, f_stream: BinaryIO) -> None:
     """
-    Zip backed_folder and write on the backup server
+    Stream the (uncompressed) tar of backed_folder to pigz, writing the compressed result in
+    f_stream. Raises a CalledProcessError if pigz fails
     """
-    with tarfile.open(backup_file, 'w:gz') as tar:
-        tar.add(backed_folder, arcname=backed_folder.name)
-    _backup_content(backup_file, nb_saves)
+    pigz = Popen(['pigz', '-p', str(cpu_count() or 1), '-c'], stdin=PIPE, stdout=f_stream)
+    with suppress(BrokenPipeError):  # pigz died, hence the failure reported below
+        with tarfile.open(fileobj=pigz.stdin, mode='w|') as tar:
+            tar.add(backed_folder, arcname=backed_folder.name)
+        pigz.stdin.close()  # type: ignore[union-attr]
+    if return_code := pigz.wait():
+        raise CalledProcessError(return_code, pigz.args)
 
 
-def _backup_content(file_to_backup: Path, nb_saves: int) -> None:
+def _delete_old_backups(ftp: FTP, backup_name: str, nb_saves: int) -> None:
     """
-    Write file_to_backup on the backup server and delete versions so as to keep only nb_saves copies
+    Delete versions of backup_name on the backup server so as to keep only nb_saves copies
     """
-    log.warning(f'Transferring backup to server: {file_to_backup}')
-    run(['lftp', '-c', f'open {get_backup_url()}; put {file_to_backup}'])
-    backups_to_delete = _get_old_backups(file_to_backup, nb_saves)
+    backups_to_delete = _get_old_backups(ftp, backup_name, nb_saves)
     log.info(f'deleting remote backups {backups_to_delete}')
     for to_rm in backups_to_delete:
-        run(['lftp', '-c', f'open {get_backup_url()}; rm {to_rm}'], capture_output=True, text=True)
-    log.info(f'deleting local {file_to_backup}')
-    file_to_backup.unlink()
+        ftp.delete(to_rm)
 
 
-def _get_old_backups(file_to_backup: Path, nb_saves: int) -> List[str]:
+def _get_old_backups(ftp: FTP, backup_name: str, nb_saves: int) -> List[str]:
     """
-    Retrieve old versions of file_to_backup in order to erase them (more than nb_saves ago)
+    Retrieve old versions of backup_name in order to erase them (more than nb_saves ago)
     """
-    output = run(['lftp', '-c', f'open {get_backup_url()}; ls'], capture_output=True, text=True)
-    filename_base = file_to_backup.name.split('.')[0]
-    all_backups = sorted([x.split(' ')[-1]
-                         for x in output.stdout.splitlines() if filename_base in x])
+    filename_base = backup_name.split('.')[0]
+    all_backups = sorted(x for x in ftp.nlst() if filename_base in x)
     log.info(f'existing remote backups {all_backups}')
     return all_backups[:-nb_saves]
@@ -1,11 +1,13 @@
 """
 Module computing and checking high level dependencies in the coe (based on pydeps)
 """
+import ast
 from pathlib import Path
 from subprocess import run
 from typing import Dict
 from typing import Iterator
 from typing import List
+from typing import Set
 
 from ecodev_core.logger import logger_get
 
@@ -99,40 +101,41 @@ def _get_current_dependencies(modules: List[str],
     directory wrt code_folder, compute the pre current dependencies as an adjacency dict.
     All the values of a given key are its dependencies. The keys and the values of
     the dictionary take their labels in the pre established module list.
+
+    NB: each python file is parsed only once, all the modules it imports being retrieved at once
     """
     module_dependencies: Dependency = {}
     for module in modules:
-        module_dependencies[module] = []
-        module_dir = code_base / module
-        for other_module in modules:
-            if other_module in module_dependencies[module]:
-                break
-            for py_file in _get_recursively_all_files_in_dir(module_dir, 'py'):
-                if _depends_on_module(module_dir / py_file, other_module, code_folder):
-                    module_dependencies[module].append(other_module)
-                    break
+        imported: Set[str] = set()
+        for py_file in _get_recursively_all_files_in_dir(code_base / module, 'py'):
+            imported.update(_imported_modules(py_file, code_folder))
+        module_dependencies[module] = [other_module for other_module in modules
+                                       if other_module in imported]
 
     return module_dependencies
 
 
-def _depends_on_module(file: Path, module: str, code_folder: str) -> bool:
+def _imported_modules(file: Path, code_folder: str) -> Set[str]:
     """
-     check if a reference to module is in the imports of python_file
+    Retrieve the high level modules of code_folder referenced in the imports of python_file
     """
-    return any(
-        (f'from {code_folder}.{module}' in line and 'import' in line)
-        or (line.startswith(f'import {code_folder}.{module}.'))
-        for line in _safe_read_lines(file)
-    )
+    imported: Set[str] = set()
+    for node in ast.walk(ast.parse(file.read_text(), filename=str(file))):
+        if isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            names = [node.module]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        imported.update(name.split('.')[1] for name in names if name.startswith(f'{code_folder}.'))
+    return imported
 
 
 def _safe_read_lines(filename: Path) -> Iterator[str]:
     """
     read all lines in file, erase the final special \n character
     """
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-    yield from [line.strip() for line in lines]
+    yield from filename.read_text(encoding='utf-8').splitlines()
 
 
 def _get_recursively_all_files_in_dir(code_folder: Path, extension: str) -> Iterator[Path]:
@@ -164,9 +167,12 @@ def _valid_modules(root_folder: Path):
 def _get_dep_matrix(modules: List[str], deps: Dependency) -> List[str]:
     """
     Retrieve the dependency matrix of the inspected solution in txt format
+
+    NB: dependencies are converted to sets once, so that each matrix cell is a constant time lookup
     """
+    dep_sets = {module: set(deps[module]) for module in modules}
     dependencies = [f'module x depends on,{",".join(modules)}']
-    dependencies.extend(f'{module},' + ','.join([_depends_on(module, other_module, deps)
+    dependencies.extend(f'{module},' + ','.join([_depends_on(module, other_module, dep_sets)
                                                  for other_module in modules])for module in modules)
 
     return dependencies
@@ -1,10 +1,9 @@
 """
 Module comparing whether two elements are both None or both not None and equals
 """
+from math import isclose
 from typing import Optional
 
-import numpy as np
-
 
 def custom_equal(element_1: Optional[object], element_2: Optional[object], element_type: type):
     """
@@ -24,4 +23,6 @@ def custom_equal(element_1: Optional[object], element_2: Optional[object], eleme
     if not isinstance(element_1, element_type) or not isinstance(element_2, element_type):
         return False
 
-    return np.isclose(element_1, element_2) if element_type == float else element_1 == element_2
+    if element_type is float:
+        return isclose(element_1, element_2, rel_tol=1e-5, abs_tol=1e-8)  # type: ignore[arg-type]
+    return element_1 == element_2
@@ -1,13 +1,18 @@
 """
 Module implementing postgresql connection
 """
+from functools import cache
+from typing import Any
 from typing import Callable
 from typing import List
 from typing import Optional
 from urllib.parse import quote
 
 from sqlalchemy import delete
+from sqlalchemy import Engine
 from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlmodel import create_engine
 from sqlmodel import Session
 from sqlmodel import SQLModel
@@ -32,18 +37,85 @@ except AttributeError:
     TEST_DB = default_test_db
 TEST_DB_URL = f'postgresql://{_USER}:{_PASSWORD}@{_HOST}:{_PORT}/{TEST_DB}'
 _ADMIN_DB_URL = f'postgresql://{_USER}:{_PASSWORD}@{_HOST}:{_PORT}/postgres'
-engine = create_engine(DB_URL, pool_pre_ping=True)
+_POOL_DEFAULTS = {'pool_size': 20, 'max_overflow': 40, 'pool_recycle': 1800, 'pool_timeout': 10,
+                  'pool_pre_ping': True}
+EXECUTEMANY_PAGE_SIZE = 1000
+
+
+@cache
+def get_engine() -> Engine:
+    """
+    Retrieve the engine of the DB_URL db, only creating it (and its connection pool) on first call
+
+    NB: the pool can be tuned with the db_pool_size, db_max_overflow, db_pool_recycle,
+    db_pool_timeout and db_pool_pre_ping database settings, falling back on _POOL_DEFAULTS.
+    Disabling pre ping saves a round trip per connection checkout, stale connections then only
+    being avoided by recycling them (db_pool_recycle should thus be shorter than any idle timeout
+    of the db, a pgbouncer or a firewall in between).
+
+    NB2: executemany calls (ORM flushes of many new objects, bulk updates...) are sent by pages of
+    EXECUTEMANY_PAGE_SIZE rows, as multi VALUES inserts or psycopg2 batches for other statements
+    """
+    return create_engine(DB_URL, **_get_pool_settings(),
+                         executemany_mode='values_plus_batch',
+                         insertmanyvalues_page_size=EXECUTEMANY_PAGE_SIZE,
+                         executemany_batch_page_size=EXECUTEMANY_PAGE_SIZE,
+                         connect_args={'application_name': 'ecodev'})
+
+
+def _get_pool_settings() -> dict[str, int | bool]:
+    """
+    Retrieve the engine pool parameters from the database settings, or their default values
+    """
+    return {name: default if (value := getattr(SETTINGS_DB, f'db_{name}', None)) is None else value
+            for name, default in _POOL_DEFAULTS.items()}
+
+
+class _LazySessionMaker(sessionmaker):
+    """
+    Session factory binding its sessions to the (lazily created) engine, unless a bind is passed
+    (or configured on the factory)
+    """
+
+    def __call__(self, **local_kw: Any) -> Session:
+        if 'bind' not in self.kw and 'bind' not in local_kw:
+            local_kw['bind'] = get_engine()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionMaker(class_=Session, expire_on_commit=False)
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Lazily resolve the engine module attribute, kept for backward compatibility
+    """
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def exec_admin_queries(queries: list[str]) -> None:
     """
     execute sequentially queries from the admin db
+
+    NB: queries are deliberately not pipelined nor run concurrently: admin queries (terminating
+    connections, then dropping and creating a db) depend on the previous ones, and DROP/CREATE
+    DATABASE cannot be sent within a multi-statement (hence transactional) batch.
     """
-    admin_engine = create_engine(_ADMIN_DB_URL, isolation_level='AUTOCOMMIT')
-    with admin_engine.connect() as conn:
+    with _get_admin_engine().connect() as conn:
         for query in queries:
             conn.execute(text(query))
-    admin_engine.dispose()
+
+
+@cache
+def _get_admin_engine() -> Engine:
+    """
+    Retrieve the (AUTOCOMMIT) engine of the admin db, only creating it on first call
+
+    NB: without pool, no connection to the admin db is kept open between calls
+    """
+    return create_engine(_ADMIN_DB_URL, isolation_level='AUTOCOMMIT', poolclass=NullPool)
 
 
 def create_db_and_tables(model: Callable, excluded_tables: Optional[List[str]] = None) -> None:
@@ -57,14 +129,14 @@ def create_db_and_tables(model: Callable, excluded_tables: Optional[List[str]] =
                                 SQLModel.metadata.__dict__.get('tables').items()
                                 if not excluded_tables or table
                                 not in excluded_tables}
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
 
 
 def delete_table(model: Callable) -> None:
     """
     Delete all rows of the passed model from db
     """
-    with Session(engine) as session:
+    with SessionLocal() as session:
         result = session.execute(delete(model))
         session.commit()
         log.info(f'Deleted {result.rowcount} rows')
@@ -73,8 +145,11 @@ def delete_table(model: Callable) -> None:
 def get_session():
     """
     Retrieves the session, used in Depends() attributes of fastapi routes
+
+    NB: being a sync generator, fastapi runs it (as well as sync routes using it) in its threadpool,
+    so that db calls made through this session never block the event loop
     """
-    with Session(engine) as session:
+    with SessionLocal() as session:
         yield session
 
 
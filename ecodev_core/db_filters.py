@@ -1,9 +1,17 @@
 """
 Low level db filtering methods
+
+NB: filters are expected to be called with a non-empty value, empty ones being skipped upstream
 """
 from datetime import datetime
 from enum import Enum
 from enum import unique
+from operator import eq
+from operator import ge
+from operator import gt
+from operator import le
+from operator import lt
+from operator import ne
 from typing import Callable
 from typing import Dict
 
@@ -16,6 +24,7 @@ from sqlmodel.sql.expression import SelectOfScalar
 SelectOfScalar.inherit_cache = True  # type: ignore
 Select.inherit_cache = True  # type: ignore
 OPERATORS = ['>=', '<=', '!=', '=', '<', '>', 'contains ']
+NUM_COMPARATORS: Dict[str, Callable] = {'>=': ge, '<=': le, '!=': ne, '=': eq, '>': gt, '<': lt}
 
 
 @unique
@@ -42,7 +51,7 @@ def _filter_start_str_field(field: InstrumentedAttribute,
 
     NB: case-insensitive!
     """
-    return query.where(func.lower(col(field)).startswith(value.lower())) if value else query
+    return query.where(func.lower(col(field)).startswith(value.lower()))
 
 
 def _filter_str_ilike_field(field: InstrumentedAttribute,
@@ -56,7 +65,7 @@ def _filter_str_ilike_field(field: InstrumentedAttribute,
 
     NB: case-insensitive!
     """
-    return query.where(col(field).ilike(f'%{value}%')) if value else query
+    return query.where(col(field).ilike(f'%{value}%'))
 
 
 def _filter_str_like_field(field: InstrumentedAttribute,
@@ -68,7 +77,7 @@ def _filter_str_like_field(field: InstrumentedAttribute,
     Add filter to the passed query for a str like field. The filtering is done by checking if
      the passed value is contained in db values
     """
-    return query.where(col(field).contains(value)) if value else query
+    return query.where(col(field).contains(value))
 
 
 def _filter_strict_str_field(field: InstrumentedAttribute,
@@ -80,7 +89,7 @@ def _filter_strict_str_field(field: InstrumentedAttribute,
     Add filter to the passed query for a strict str equality matching.
     The filtering is done by checking if the passed value is equal to one of the db values
     """
-    return query.where(col(field) == value) if value else query
+    return query.where(col(field) == value)
 
 
 def _filter_bool_like_field(field: InstrumentedAttribute,
@@ -92,7 +101,7 @@ def _filter_bool_like_field(field: InstrumentedAttribute,
     Add filter to the passed query for a bool like field. The filtering is done by comparing
      the passed value to db values
     """
-    return query.where(col(field) == value) if value else query
+    return query.where(col(field) == value)
 
 
 def _filter_num_like_field(field: InstrumentedAttribute,
@@ -106,22 +115,8 @@ def _filter_num_like_field(field: InstrumentedAttribute,
     is set to True) field. The filtering is done by comparing the passed value to db values
     with the passed operator.
     """
-    if not operator or not value:
-        return query
-
-    if operator == '>=':
-        query = query.where(col(field) >= (_date(value) if is_date else float(value)))
-    elif operator == '<=':
-        query = query.where(col(field) <= (_date(value) if is_date else float(value)))
-    elif operator == '!=':
-        query = query.where(col(field) != (_date(value) if is_date else float(value)))
-    elif operator == '=':
-        query = query.where(col(field) == (_date(value) if is_date else float(value)))
-    elif operator == '>':
-        query = query.where(col(field) > (_date(value) if is_date else float(value)))
-    elif operator == '<':
-        query = query.where(col(field) < (_date(value) if is_date else float(value)))
-
+    if comparator := NUM_COMPARATORS.get(operator):
+        return query.where(comparator(col(field), _date(value) if is_date else float(value)))
     return query
 
 
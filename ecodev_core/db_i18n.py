@@ -3,6 +3,9 @@ Module implementing internationalization (i18n) for sqlmodel
 """
 import contextvars
 from enum import Enum
+from functools import lru_cache
+from functools import partial
+from typing import Any
 from typing import Optional
 
 from sqlalchemy import Label
@@ -72,6 +75,17 @@ class I18nMixin:
     __localized_fields__: dict[str, list[Lang]] = {}
     __fallback_lang__: Lang = Lang.EN
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """
+        Exposes each field of `__localized_fields__` (not otherwise defined by the subclass) as a
+        property returning its localized value, so that accessing it does not go through the
+        `__getattr__` fallback.
+        """
+        super().__init_subclass__(**kwargs)
+        for field in cls.__localized_fields__:
+            if field not in cls.__dict__:
+                setattr(cls, field, property(partial(cls._get_localized, field=field)))
+
     @classmethod
     def _get_lang_chain(cls, field: str, lang: Optional[Lang] = None) -> list[Lang]:
         """
@@ -89,22 +103,7 @@ class I18nMixin:
             list[Lang]: List of Lang enums to use for generating the name of the localized \
                 fields.
         """
-        if field not in cls.__localized_fields__:
-            raise AttributeError(f'Field {field!r} is not internationalized.')
-        
-        available_langs = cls.__localized_fields__[field]
-        
-        if cls.__fallback_lang__ not in available_langs:
-            raise AttributeError(
-                f'Fallback language {cls.__fallback_lang__!r} not available for field {field!r}. '
-                f'Available: {available_langs}'
-            )
-        
-        lang = lang or get_lang()
-        if lang not in cls.__localized_fields__[field]:
-            raise AttributeError(f'Field {field!r} is not localized to {lang!r}')
-
-        return [lang] if cls.__fallback_lang__ == lang else [lang, cls.__fallback_lang__]
+        return list(_lang_chain(cls, field, lang or get_lang()))  # type: ignore[arg-type]
 
     @classmethod
     def _get_localized_field_name(cls, field: str, lang: Lang) -> str:
@@ -137,8 +136,8 @@ class I18nMixin:
             list[str]: chain of the localized versions of the requested field.
 
         """
-        return [cls._get_localized_field_name(field, lang) 
-                for lang in cls._get_lang_chain(field, lang)]
+        return list(_localized_field_chain(cls, field,  # type: ignore[arg-type]
+                                           lang or get_lang()))
 
     def _get_localized(self, field: str, lang: Optional[Lang] = None) -> Optional[str]:
         """
@@ -175,12 +174,52 @@ class I18nMixin:
         """
         Overrides __getattr__ to get the localized value of a item if it figures in
         `__localized_fields__`.
+
+        NB: only reached for localized fields added to `__localized_fields__` after the class
+        definition, the others being served by properties.
         """
         if item in self.__localized_fields__:
             return self._get_localized(item)
         raise AttributeError(f'{self.__class__.__name__!r} object has no attribute {item!r}')
 
 
+@lru_cache(maxsize=512)
+def _lang_chain(cls: type[I18nMixin], field: str, lang: Lang) -> tuple[Lang, ...]:
+    """
+    Cached computation of [_get_lang_chain][ecodev_core.db_i18n.I18nMixin._get_lang_chain] for an
+    already resolved `lang`.
+
+    NB: the cache is keyed on the class, whose `__localized_fields__` and `__fallback_lang__`
+    are expected not to change after its definition.
+    """
+    if field not in cls.__localized_fields__:
+        raise AttributeError(f'Field {field!r} is not internationalized.')
+
+    available_langs = cls.__localized_fields__[field]
+
+    if cls.__fallback_lang__ not in available_langs:
+        raise AttributeError(
+            f'Fallback language {cls.__fallback_lang__!r} not available for field {field!r}. '
+            f'Available: {available_langs}'
+        )
+
+    if lang not in available_langs:
+        raise AttributeError(f'Field {field!r} is not localized to {lang!r}')
+
+    return (lang,) if cls.__fallback_lang__ == lang else (lang, cls.__fallback_lang__)
+
+
+@lru_cache(maxsize=512)
+def _localized_field_chain(cls: type[I18nMixin], field: str, lang: Lang) -> tuple[str, ...]:
+    """
+    Cached computation of
+    [get_localized_field_chain][ecodev_core.db_i18n.I18nMixin.get_localized_field_chain] for an
+    already resolved `lang`.
+    """
+    return tuple(cls._get_localized_field_name(field, chain_lang)
+                 for chain_lang in _lang_chain(cls, field, lang))  # type: ignore[arg-type]
+
+
 def localized_col(
     field: str,
     db_schema: SQLModelMetaclass,
@@ -204,8 +243,18 @@ def localized_col(
     """
     if not issubclass(db_schema, I18nMixin):
         raise TypeError(f"{db_schema.__name__} does not inherit from I18nMixin")
-    
-    localized_fields_chain = db_schema.get_localized_field_chain(field, lang)
+
+    return _localized_col(field, db_schema, lang or get_lang())  # type: ignore[arg-type]
+
+
+@lru_cache(maxsize=512)
+def _localized_col(field: str, db_schema: type[I18nMixin], lang: Lang) -> Label:
+    """
+    Cached computation of [localized_col][ecodev_core.db_i18n.localized_col] for an already
+    resolved `lang`, the (immutable) label being reused by every query localizing `field`.
+    """
+    localized_fields_chain = _localized_field_chain(db_schema, field,  # type: ignore[arg-type]
+                                                    lang)
     coalesce_fields = [getattr(db_schema, field_name) for field_name in localized_fields_chain]
 
     return label(field, func.coalesce(*coalesce_fields))
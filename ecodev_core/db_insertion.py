@@ -1,12 +1,14 @@
 """
 Module implementing functions to insert data within the db
 """
-from io import BytesIO
 from pathlib import Path
+from tempfile import SpooledTemporaryFile
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 from typing import Union
 
 import pandas as pd
@@ -14,6 +16,11 @@ import progressbar
 from fastapi import BackgroundTasks
 from fastapi import UploadFile
 from pandas import ExcelFile
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col
+from sqlmodel import inspect
+from sqlmodel import select
 from sqlmodel import Session
 from sqlmodel import SQLModel
 from sqlmodel.main import SQLModelMetaclass
@@ -26,6 +33,8 @@ from ecodev_core.pydantic_utils import CustomFrozen
 from ecodev_core.safe_utils import SimpleReturn
 
 log = logger_get(__name__)
+UPLOAD_CHUNK_SIZE = 1 << 20
+UPLOAD_SPOOL_SIZE = 64 << 20
 
 
 class Insertor(CustomFrozen):
@@ -40,12 +49,33 @@ class Insertor(CustomFrozen):
           a user if a user with the same name is not already present in the db)
         - convertor: how to convert the raw csv/excel passed by the user to json like db rows
         - read_excel_file: whether to insert data based on an xlsx (if true) or a csv (if false)
+        - key_fields: if filled, the db_schema fields on which selector matches. Existing rows are
+          then retrieved by batches in a few queries instead of one query per row
+        - update_fields: if filled (along with key_fields, which must then be backed by a unique
+          constraint), the db_schema fields updated by reductor. Rows are then upserted by batches
+          with INSERT ... ON CONFLICT DO UPDATE statements, without any select
     """
     reductor: Callable[[Any, Any], Any]
     db_schema: Callable
     selector: Callable[[Any], SelectOfScalar]
     convertor: Callable[[Union[pd.DataFrame, ExcelFile]], List[Dict]]
     read_excel_file: bool = True
+    key_fields: Optional[List[str]] = None
+    update_fields: Optional[List[str]] = None
+
+    def get_key(self, db_row: SQLModel) -> Tuple:
+        """
+        Retrieve the values of the key_fields of the passed db_row
+        """
+        return tuple(getattr(db_row, field) for field in self.key_fields or [])
+
+    def batch_selector(self, db_rows: List[SQLModel]) -> SelectOfScalar:
+        """
+        Select in one query all the in db rows matching (on key_fields) one of the passed db_rows
+        """
+        key_cols = tuple_(*[col(getattr(self.db_schema, field)) for field in self.key_fields or []])
+        return select(self.db_schema).where(  # type: ignore[call-overload]
+            key_cols.in_([self.get_key(row) for row in db_rows]))
 
 
 def generic_insertion(df_or_xl: Union[pd.DataFrame, ExcelFile, Path],
@@ -77,9 +107,38 @@ async def insert_file(file: UploadFile, insertor: Insertor, session: Session) ->
 def insert_data(df: Union[pd.DataFrame, ExcelFile], insertor: Insertor, session: Session) -> None:
     """
     Inserts a csv/df into a database
+
+    NB: if the insertor defines key_fields, existing rows are retrieved BATCH_SIZE at a time with
+    the insertor batch_selector, instead of one selector query per row, and new rows are bulk
+    inserted. If it also defines update_fields backed in db by a unique index, rows are directly
+    upserted by the db, BATCH_SIZE at a time.
     """
-    for row in insertor.convertor(df):
-        session.add(create_or_update(session, row, insertor))
+    if insertor.key_fields and insertor.update_fields and has_unique_key(insertor, session):
+        _upsert_data([insertor.db_schema(**row) for row in insertor.convertor(df)], insertor,
+                     session)
+        return
+
+    if not insertor.key_fields:
+        for row in insertor.convertor(df):
+            session.add(create_or_update(session, row, insertor))
+        session.commit()
+        return
+
+    db_rows = [insertor.db_schema(**row) for row in insertor.convertor(df)]
+    for batch in [db_rows[i:i + BATCH_SIZE] for i in range(0, len(db_rows), BATCH_SIZE)]:
+        in_db_rows = {insertor.get_key(in_db_row): in_db_row
+                      for in_db_row in session.exec(insertor.batch_selector(batch))}
+        new_rows: Dict[Tuple, SQLModel] = {}
+        for db_row in batch:
+            key = insertor.get_key(db_row)
+            if in_db_row := in_db_rows.get(key):
+                session.add(insertor.reductor(in_db_row, db_row))
+            elif new_row := new_rows.get(key):
+                new_rows[key] = insertor.reductor(new_row, db_row)
+            else:
+                new_rows[key] = db_row
+        session.bulk_insert_mappings(insertor.db_schema,  # type: ignore[arg-type]
+                                     [_db_values(row) for row in new_rows.values()])
     session.commit()
 
 
@@ -101,6 +160,48 @@ def insert_batch_data(data: list[dict | SQLModelMetaclass],
         session.commit()
 
 
+def has_unique_key(insertor: Insertor, session: Session) -> bool:
+    """
+    Whether the insertor key_fields are backed in db by a unique index or constraint (allowing to
+    upsert on them with ON CONFLICT).
+
+    NB: checked on the db and not on the db_schema, a unique=True added to the schema of an already
+    existing table not being applied to it
+    """
+    table = insertor.db_schema.__table__  # type: ignore[attr-defined]
+    inspector = inspect(session.connection())
+    uniques = [idx['column_names'] for idx in inspector.get_indexes(table.name, table.schema)
+               if idx['unique']] + [cons['column_names'] for cons in
+                                    inspector.get_unique_constraints(table.name, table.schema)]
+    return any(set(cols) == set(insertor.key_fields or []) for cols in uniques)
+
+
+def _upsert_data(db_rows: List[SQLModel], insertor: Insertor, session: Session) -> None:
+    """
+    Upsert the passed db_rows, BATCH_SIZE at a time, with INSERT ... ON CONFLICT DO UPDATE
+
+    NB: a row appearing several times (same key_fields values) is upserted once, its last
+    occurrence winning. Unset primary keys are left to the db
+    """
+    rows = {insertor.get_key(db_row): _db_values(db_row) for db_row in db_rows}
+    values = list(rows.values())
+    for batch in [values[i:i + BATCH_SIZE] for i in range(0, len(values), BATCH_SIZE)]:
+        query = insert(insertor.db_schema.__table__).values(batch)  # type: ignore[attr-defined]
+        session.execute(query.on_conflict_do_update(
+            index_elements=insertor.key_fields,
+            set_={field: query.excluded[field] for field in insertor.update_fields or []}))
+    session.commit()
+
+
+def _db_values(db_row: SQLModel) -> Dict[str, Any]:
+    """
+    Column values of the passed db_row, unset primary keys being left out (to be filled by the db)
+    """
+    primary_keys = db_row.__table__.primary_key.columns.keys()  # type: ignore[attr-defined]
+    return {field: value for field, value in db_row.model_dump().items()
+            if value is not None or field not in primary_keys}
+
+
 def create_or_update(session: Session, row: Dict, insertor: Insertor) -> SQLModel:
     """
     Create a new row in db if the selector insertor does not find existing row in db. Update the row
@@ -114,15 +215,24 @@ def create_or_update(session: Session, row: Dict, insertor: Insertor) -> SQLMode
 
 async def get_raw_df(file: UploadFile,
                      read_excel_file: bool,
-                     sep: str = ',') -> Union[pd.DataFrame, ExcelFile]:
+                     sep: str = ',',
+                     csv_engine: str = 'c') -> Union[pd.DataFrame, ExcelFile]:
     """
     Retrieves the raw data from the uploaded file at pandas format
+
+    NB: the upload is copied by chunks in a spooled file (in memory up to UPLOAD_SPOOL_SIZE bytes,
+    on disk beyond) read by pandas, so that it is never fully loaded in memory as raw bytes. The
+    ExcelFile keeping a handle on it, the copy outlives the request (and its uploaded file).
+    Csv files are parsed by the passed pandas csv_engine: the multithreaded 'pyarrow' one (if
+    installed) can be opted in for large files, keeping in mind that it parses iso dates as
+    datetimes and does not support regex or multi-character separators.
     """
-    contents = await file.read()
+    spooled = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        spooled.write(chunk)
+    spooled.seek(0)
     if read_excel_file:
-        return pd.ExcelFile(contents)
+        return pd.ExcelFile(spooled)
 
-    buffer = BytesIO(contents)
-    raw_content = pd.read_csv(buffer, sep=sep)
-    buffer.close()
-    return raw_content
+    with spooled:
+        return pd.read_csv(spooled, sep=sep, engine=csv_engine)
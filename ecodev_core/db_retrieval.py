@@ -1,10 +1,11 @@
 """
 Low level methods to retrieve data from db in a paginated way
 """
+import re
+from functools import lru_cache
 from math import ceil
 from typing import Any
 from typing import Callable
-from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -12,6 +13,7 @@ from typing import Union
 
 import pandas as pd
 from sqlalchemy import func
+from sqlalchemy import tuple_
 from sqlmodel import col
 from sqlmodel import or_
 from sqlmodel import select
@@ -19,16 +21,17 @@ from sqlmodel import Session
 from sqlmodel.sql.expression import Select
 from sqlmodel.sql.expression import SelectOfScalar
 
-from ecodev_core.db_connection import engine
+from ecodev_core.db_connection import SessionLocal
 from ecodev_core.db_filters import SERVER_SIDE_FILTERS
 from ecodev_core.db_filters import ServerSideFilter
+from ecodev_core.db_i18n import I18nMixin
 from ecodev_core.db_upsertion import FILTER_ON
-from ecodev_core.list_utils import first_or_default
 from ecodev_core.pydantic_utils import Frozen
 
 SelectOfScalar.inherit_cache = True  # type: ignore
 Select.inherit_cache = True  # type: ignore
 OPERATORS = ['>=', '<=', '!=', '=', '<', '>', 'contains ']
+_OPERATORS_RE = re.compile('|'.join(re.escape(operator) for operator in OPERATORS))
 
 
 class ServerSideField(Frozen):
@@ -56,8 +59,10 @@ def count_rows(fields: List[ServerSideField],
     """
     Count the total number of rows in the db model, with statically defined field_filters fed with
     dynamically set frontend filters. Divide this total number by limit to account for pagination.
+
+    NB: when a page of rows is also needed, prefer get_page, which retrieves both in one query
     """
-    with Session(engine) as session:
+    with SessionLocal() as session:
         count = session.exec(_get_full_query(fields, model, filter_str, True, search_str,
                                              search_cols)).one()
 
@@ -71,7 +76,8 @@ def get_rows(fields: List[ServerSideField],
              filter_str: str = '',
              search_str: str = '',
              search_cols: Optional[List] = None,
-             fields_order: Optional[Callable] = None
+             fields_order: Optional[Callable] = None,
+             after: Optional[Tuple] = None
              ) -> pd.DataFrame:
     """
     Select relevant row lines from model db. Select the whole db if no limit or offset is provided.
@@ -81,16 +87,78 @@ def get_rows(fields: List[ServerSideField],
     * 'fields_order' specify how to order the result rows
     * 'limit' and 'offset' correspond to the pagination of the results.
     * 'search_str' corresponds to the search string from the search input.
+    * 'after' (keyset pagination) is the (fields values..., id) tuple of the last row of the
+      previous page: the limit rows ordered after it are then sought, instead of scanning and
+      discarding offset * limit rows. Rows are ordered by fields then id ('fields_order' and
+      'offset' being ignored), and fields values should not be null.
+    * pandas directly reads the db cursor, without building (and dumping) a model instance per
+      row. Localized (I18nMixin) models still go through their instances.
+    """
+    with SessionLocal() as session:
+        if issubclass(model, I18nMixin):
+            return _rows_to_df(fields, _paginate_db_lines(fields, model, session, limit, offset,
+                                                          filter_str, search_str, search_cols,
+                                                          fields_order, after))
+        raw_df = pd.read_sql_query(_get_paginated_query(fields, model, limit, offset, filter_str,
+                                                        search_str, search_cols, fields_order,
+                                                        after),
+                                   session.connection())
+    return _format_df(fields, raw_df)
+
+
+def get_page(fields: List[ServerSideField],
+             model: Any,
+             limit: Union[int, None] = None,
+             offset: Union[int, None] = None,
+             filter_str: str = '',
+             search_str: str = '',
+             search_cols: Optional[List] = None,
+             fields_order: Optional[Callable] = None
+             ) -> Tuple[pd.DataFrame, int]:
+    """
+    Retrieve in a single query both the get_rows dataframe and the count_rows number of pages (or
+    of rows if no limit is provided), the total row count riding along with the page thanks to a
+    window function.
+
+    NB: if the requested page is empty while the filtered table is not (offset too big), a count
+    query is still needed to recover the total.
+
+    NB2: as in get_rows, pandas directly reads the db cursor, except for localized (I18nMixin)
+    models.
+    """
+    query = _get_paginated_query(fields, model, limit, offset, filter_str, search_str, search_cols,
+                                 fields_order).add_columns(func.count().over().label('total'))
+    with SessionLocal() as session:
+        if issubclass(model, I18nMixin):
+            results = list(session.exec(query))  # type: ignore[call-overload]
+            df = _rows_to_df(fields, [row[0] for row in results])
+            count = results[0].total if results else 0
+        else:
+            raw_df = pd.read_sql_query(query, session.connection())
+            df = _format_df(fields, raw_df)
+            count = int(raw_df['total'].iloc[0]) if len(raw_df) else 0
+    if df.empty and offset:
+        return df, count_rows(fields, model, limit, filter_str, search_str, search_cols)
+    return df, ceil(count / limit) if limit else count
+
+
+def _rows_to_df(fields: List[ServerSideField], rows: List) -> pd.DataFrame:
+    """
+    Convert the passed model rows to a dataframe whose columns are the fields col_names
     """
-    with Session(engine) as session:
-        rows = _paginate_db_lines(fields, model, session, limit, offset, filter_str,
-                                  search_str, search_cols, fields_order)
     if len(raw_df := pd.DataFrame.from_records([row.model_dump() for row in rows])) > 0:
-        return raw_df.rename(columns={field.field_name: field.col_name for field in fields}
-                             )[[field.col_name for field in fields]]
+        return _format_df(fields, raw_df)
     return pd.DataFrame(columns=[field.col_name for field in fields])
 
 
+def _format_df(fields: List[ServerSideField], raw_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rename the raw_df model columns to the fields col_names, keeping only those (in fields order)
+    """
+    return raw_df.rename(columns={field.field_name: field.col_name for field in fields}
+                         )[[field.col_name for field in fields]]
+
+
 def _paginate_db_lines(fields: List[ServerSideField],
                        model: Any,
                        session: Session,
@@ -100,18 +168,45 @@ def _paginate_db_lines(fields: List[ServerSideField],
                        search_str: str = '',
                        search_cols: Optional[List] = None,
                        fields_order: Optional[Callable] = None,
+                       after: Optional[Tuple] = None
                        ) -> List:
     """
     Select relevant row lines from model db. Select the whole db if no limit or offset is provided.
     """
+    return list(session.exec(_get_paginated_query(fields, model, limit, offset, filter_str,
+                                                  search_str, search_cols, fields_order, after)))
+
+
+def _get_paginated_query(fields: List[ServerSideField],
+                         model: Any,
+                         limit: Union[int, None],
+                         offset: Union[int, None],
+                         filter_str: str,
+                         search_str: str = '',
+                         search_cols: Optional[List] = None,
+                         fields_order: Optional[Callable] = None,
+                         after: Optional[Tuple] = None
+                         ) -> SelectOfScalar:
+    """
+    Forge the (ordered) query selecting relevant row lines from model db. Select the whole db if no
+    limit or offset is provided.
+
+    NB: if after is provided, rows are sought after it in (fields..., id) order (keyset pagination)
+    """
+    if after is not None:
+        keys = [field.field for field in fields] + [model.id]
+        query = _get_full_query(fields, model, filter_str, count=False, search_str=search_str,
+                                search_cols=search_cols).where(tuple_(*keys) > tuple_(*after))
+        return query.order_by(*keys).limit(limit)
+
     if fields_order is None:
         fields_order = _get_default_field_order(fields)
 
     query = fields_order(_get_full_query(fields, model, filter_str, count=False,
                                          search_str=search_str, search_cols=search_cols))
     if limit is not None and offset is not None:
-        return list(session.exec(query.offset(offset * limit).limit(limit)))
-    return list(session.exec(query).all())
+        return query.offset(offset * limit).limit(limit)
+    return query
 
 
 def _get_full_query(fields: List[ServerSideField],
@@ -127,36 +222,47 @@ def _get_full_query(fields: List[ServerSideField],
     NB:
     * This relies on the passed statically defined field_filters corresponding to the model.
     * The field_filters are used jointly with the dynamically set frontend filters.
-
+    * The search ILIKE '%search_str%' conditions can only use trigram indexes (a leading wildcard
+      defeating btree ones): see add_search_indexes to create them on the search_cols.
     """
     filter_query = _get_filter_query(fields, model, _get_frontend_filters(filter_str), count)
 
     if not search_str or not search_cols:
         return filter_query
 
-    return filter_query.where(or_(col(field).ilike(f'%{search_str.strip()}%')
-                                  for field in search_cols))
+    pattern = f'%{search_str.strip()}%'
+    return filter_query.where(or_(*[col(field).ilike(pattern) for field in search_cols]))
 
 
-def _get_frontend_filters(raw_filters: str) -> Dict[str, Tuple[str, str]]:
+@lru_cache(maxsize=1024)
+def _get_frontend_filters(raw_filters: str) -> Tuple[Tuple[str, Tuple[str, str]], ...]:
     """
-    Forge a dictionary of field keys, (operator, value) values in order to filter a db model.
+    Forge field keys, (operator, value) pairs in order to filter a db model.
+
+    NB: the result is cached (hence immutable), count_rows and get_rows parsing the same filters
     """
     split_filters = raw_filters.split(' && ')
-    return {elt[elt.find('{') + 1: elt.rfind('}')]: _forge_filter(elt) for elt in split_filters}
+    return tuple({elt[elt.find('{') + 1: elt.rfind('}')]: _forge_filter(elt)
+                  for elt in split_filters}.items())
 
 
+@lru_cache(maxsize=1024)
 def _forge_filter(elt: str) -> Tuple[str, str]:
     """
-    Forge the operator and value associated to the passed element. Do so by scanning the ordered
-    sequence of OPERATORS and returning the first matching (value is on the right of it).
+    Forge the operator and value associated to the passed element. Do so by searching (after the
+    {field} key) the first of OPERATORS appearing in elt (value is on the right of it).
+
+    NB: OPERATORS being ordered, two characters operators take precedence over their one character
+    prefix at a given position (>= is matched rather than >).
     """
-    return next(((key, elt.split(key)[-1]) for key in OPERATORS if key in elt), ('', ''))
+    if match := _OPERATORS_RE.search(elt, elt.rfind('}') + 1):
+        return match.group(), elt[match.end():]
+    return '', ''
 
 
 def _get_filter_query(fields: List[ServerSideField],
                       model: Any,
-                      frontend_filters: Dict[str, Tuple[str, str]],
+                      frontend_filters: Tuple[Tuple[str, Tuple[str, str]], ...],
                       count: bool = False
                       ) -> SelectOfScalar:
     """
@@ -167,11 +273,12 @@ def _get_filter_query(fields: List[ServerSideField],
         * or the filter row count.
     """
     query = select(func.count(model.id)) if count else select(model)
-    if not frontend_filters or not all(frontend_filters.keys()):
+    if not frontend_filters or not all(key for key, _ in frontend_filters):
         return query
 
-    for key, (operator, value) in frontend_filters.items():
-        if field := first_or_default(fields, lambda x: x.col_name == key):
+    fields_by_col = {field.col_name: field for field in reversed(fields)}
+    for key, (operator, value) in frontend_filters:
+        if value and (field := fields_by_col.get(key)):
             query = SERVER_SIDE_FILTERS[field.filter](query=query, operator=operator,
                                                       value=value, field=field.field)
 
@@ -181,6 +288,16 @@ def _get_filter_query(fields: List[ServerSideField],
 def _get_default_field_order(fields: List[ServerSideField]) -> Callable:
     """
     Recover default field order from list of fields
+
+    NB: the ordering is memoized per fields attributes, pages of a same table sharing it
+    """
+    return _get_order_by(tuple(field.field for field in fields))
+
+
+@lru_cache(maxsize=64)
+def _get_order_by(order_fields: Tuple) -> Callable:
+    """
+    Forge the ordering of a query on the passed fields attributes
     """
     def fields_order(query):
         """
@@ -188,6 +305,6 @@ def _get_default_field_order(fields: List[ServerSideField]) -> Callable:
 
         Take the initial query as input and specify the order to use.
         """
-        return query.order_by(*[field.field for field in fields])
+        return query.order_by(*order_fields)
 
     return fields_order
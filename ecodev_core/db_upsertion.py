@@ -1,22 +1,38 @@
 """
 Module handling CRUD and version operations
 """
+import csv
 import enum
+import io
 import json
+import operator
 import types
 from datetime import datetime
 from enum import EnumType
+from functools import lru_cache
 from functools import partial
 from typing import Any
+from typing import Callable
 from typing import get_args
 from typing import get_origin
+from typing import Iterable
 from typing import Iterator
+from typing import Sequence
 from typing import Union
 
 import pandas as pd
 import progressbar
 from pydantic_core._pydantic_core import PydanticUndefined
+from sqlalchemy import ARRAY
+from sqlalchemy import cast
+from sqlalchemy import column
+from sqlalchemy import tuple_
+from sqlalchemy import UniqueConstraint
+from sqlalchemy import Values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import and_
+from sqlmodel import delete
 from sqlmodel import Field
 from sqlmodel import inspect
 from sqlmodel import select
@@ -27,13 +43,15 @@ from sqlmodel import update
 from sqlmodel.main import SQLModelMetaclass
 from sqlmodel.sql.expression import SelectOfScalar
 
-from ecodev_core.version import get_row_versions
 from ecodev_core.version import Version
+from ecodev_core.version import version_row
 
 BATCH_SIZE = 5000
 FILTER_ON = 'filter_on'
 INFO = 'info'
 SA_COLUMN_KWARGS = 'sa_column_kwargs'
+_SQL_TYPES = {str: 'VARCHAR', int: 'INTEGER', float: 'FLOAT', bool: 'BOOLEAN', bytes: 'BYTEA',
+              dict: 'JSONB'}
 
 
 def add_missing_enum_values(enum: EnumType, session: Session, new_vals: list | None = None) -> None:
@@ -42,10 +60,18 @@ def add_missing_enum_values(enum: EnumType, session: Session, new_vals: list | N
     insert what is new.
 
     NB: new_val argument is there for testing purposes
-    """
 
-    for val in [e.name for e in new_vals or enum if e.name not in get_enum_values(enum, session)]:
-        session.execute(text(f"ALTER TYPE {enum.__name__.lower()} ADD VALUE IF NOT EXISTS '{val}'"))
+    NB2: all missing values are added by a single multi statement request (and transaction),
+    which requires postgres 12 or later
+    """
+    existing, queries = get_enum_values(enum, session), []
+    for val in [e.name for e in new_vals or enum]:
+        if val in existing:
+            continue
+        queries.append(f"ALTER TYPE {enum.__name__.lower()} ADD VALUE IF NOT EXISTS '{val}'")
+        existing.add(val)
+    if queries:
+        session.execute(text(';\n'.join(queries)))
         session.commit()
 
 
@@ -94,8 +120,8 @@ def upsert_selector(values: SQLModel, db_schema: SQLModelMetaclass) -> SelectOfS
     """
     Return the query allowing to select on column not to be versioned values.
     """
-    conditions = [getattr(db_schema, x.name) == getattr(values, x.name)
-                  for x in inspect(db_schema).c if x.info.get(FILTER_ON) is True]
+    conditions = [getattr(db_schema, col) == getattr(values, col)
+                  for col in _get_schema_columns(db_schema)[0]]
     return select(db_schema).where(and_(*conditions))
 
 
@@ -111,72 +137,430 @@ def upsert_updator(values: SQLModel,
 
     At the same time, store previous (column, row_id) versions for all columns that changed values.
     """
-    to_update = {col.name: getattr(values, col.name)
-                 for col in inspect(db_schema).c if col.info.get(FILTER_ON) is False}
-    db = session.exec(select(db_schema).where(db_schema.id == row_id)).first().model_dump()
-    col_types = {x: y.annotation for x, y in db_schema.__fields__.items()}
-    table = db_schema.__tablename__
+    in_db = session.exec(select(db_schema).where(db_schema.id == row_id)).first()
+    to_update, changes = _get_updates(values, in_db.model_dump(), row_id, db_schema)
+    _add_versions(changes, session, db_schema, version_id)
+    return update(db_schema).where(db_schema.id == row_id).values(**to_update)
 
-    for col, val in {k: v for k, v in db.items() if k in to_update and _value_comparator(
-            v, to_update[k])}.items():
-        if version_id and (version_db := session.exec(select(Version).where(
-                Version.table == table,
-                Version.column == col,
-                Version.row_id == row_id,
-                Version.version_id == version_id)).first()):
-            version_db.value = val
-        else:
-            session.add(Version.from_table_row(table, col, row_id, col_types[col], val, version_id))
 
-    return update(db_schema).where(db_schema.id == row_id).values(**to_update)
+def _get_updates(values: SQLModel,
+                 in_db: dict[str, Any],
+                 row_id: int,
+                 db_schema: SQLModelMetaclass
+                 ) -> tuple[dict[str, Any], list[tuple[int, str, Any]]]:
+    """
+    Compute the columns to be versioned to update in the row_id row (whose current values are
+    in_db) with the passed new values, as well as the (row_id, column, previous value) versions of
+    the columns that changed values.
+    """
+    to_update = {col: getattr(values, col) for col in _get_schema_columns(db_schema)[1]}
+    changes = [(row_id, col, in_db[col]) for col, differ in _get_differs(db_schema)
+               if differ(in_db[col], to_update[col])]
+    return to_update, changes
 
 
-def _value_comparator(v: Any, to_update: Any) -> bool:
+@lru_cache(maxsize=None)
+def _get_differs(db_schema: SQLModelMetaclass
+                 ) -> tuple[tuple[str, Callable[[Any, Any], bool]], ...]:
     """
-    Performs a comparison between the value in db and the value to be upserted
+    Retrieve (once per db_schema) its columns to be versioned, each paired with the function
+    telling whether its value changed: _date_differ for datetime columns, != for the others.
     """
-    return v.date() != to_update.date() if isinstance(v, datetime) else v != to_update
+    _, versioned, col_types = _get_schema_columns(db_schema)
+    return tuple((col, _date_differ if _is_datetime(col_types[col]) else operator.ne)
+                 for col in versioned)
+
+
+def _is_datetime(col_type: Any) -> bool:
+    """
+    Whether the passed (possibly optional) field type is a datetime one
+    """
+    clean_type = _clean_py_type(col_type)
+    return isinstance(clean_type, type) and issubclass(clean_type, datetime)
+
+
+def _date_differ(v: datetime | None, to_update: datetime | None) -> bool:
+    """
+    Performs a comparison (at the day level) between the datetime in db and the one to be upserted
+
+    NB: only used on datetime columns, hence the values are either datetimes or None
+    """
+    if v is None or to_update is None:
+        return v is not to_update
+    return v.date() != to_update.date()
 
 
 def upsert_deletor(values: SQLModel, session: Session):
     """
     Delete row in db corresponding to the passed values, selecting on columns not to be versioned.
+
+    NB: the row versions and the row itself are deleted by two DELETE statements, the versions
+    one selecting the row id in a subquery
     """
     db_schema = values.__class__
-    if in_db := session.exec(upsert_selector(values, db_schema=db_schema)).first():
-        for version in get_row_versions(db_schema.__tablename__, in_db.id, session):
-            session.delete(version)
-        session.delete(in_db)
-        session.commit()
+    _delete_rows(db_schema, upsert_selector(values, db_schema=db_schema).whereclause, session)
+    session.commit()
 
 
-def upsert_df_data(df: Union[pd.DataFrame], db_schema: SQLModelMetaclass, session: Session) -> None:
+def upsert_deletor_many(values: list[SQLModel], session: Session) -> None:
+    """
+    Delete rows in db corresponding to the passed values (all of the same db_schema), selecting on
+    columns not to be versioned.
+
+    NB: all rows (and their versions) are deleted by two DELETE statements per BATCH_SIZE values.
+    Values having a null sfield (matched with IS NULL) are deleted one by one by upsert_deletor.
+    """
+    if not values:
+        return
+    db_schema = values[0].__class__
+    sfields = _get_schema_columns(db_schema)[0]
+    key_cols = tuple_(*[getattr(db_schema, col) for col in sfields])
+    keys = [tuple(getattr(value, col) for col in sfields) for value in values]
+    for batch in _get_batches([key for key in keys if None not in key], False):
+        _delete_rows(db_schema, key_cols.in_(batch), session)
+    session.commit()
+    for value, key in zip(values, keys):
+        if None in key:
+            upsert_deletor(value, session)
+
+
+def _delete_rows(db_schema: SQLModelMetaclass, condition: Any, session: Session) -> None:
+    """
+    Delete the db_schema rows matching condition, along with their versions
+    """
+    session.execute(delete(Version).where(
+        Version.table == db_schema.__tablename__,  # type: ignore[attr-defined]
+        Version.row_id.in_(select(db_schema.id).where(condition))))  # type: ignore
+    session.execute(delete(db_schema).where(condition))
+
+
+def upsert_df_data(df: Union[pd.DataFrame],
+                   db_schema: SQLModelMetaclass,
+                   session: Session,
+                   verbose: bool = False) -> None:
     """
     Upsert the passed df into db_schema db.
+
+    NB: the df is converted to records one BATCH_SIZE chunk at a time, so that only one batch of
+    dicts lives in memory at once
     """
-    upsert_data([x.to_dict() for _, x in df.iterrows()], session, raw_db_schema=db_schema)
+    starts = range(0, len(df), BATCH_SIZE)
+    for start in progressbar.progressbar(starts, redirect_stdout=False) if verbose else starts:
+        upsert_data_trusted(df.iloc[start:start + BATCH_SIZE].to_dict(orient='records'), session,
+                            db_schema)
 
 
-def upsert_data(data: list[dict | SQLModelMetaclass],
+def upsert_data(data: Sequence[dict | SQLModelMetaclass],
                 session: Session,
                 raw_db_schema: SQLModelMetaclass | None = None,
-                version_id: str | None = None) -> None:
+                version_id: str | None = None,
+                verbose: bool = False) -> None:
+    """
+    Upsert the passed list of dicts (corresponding to db_schema) into db_schema db. A progress bar
+    over the batches is displayed if verbose.
+
+    NB: if the db_schema sfields are backed by a unique constraint (or index), each batch is
+    upserted by a single INSERT ... ON CONFLICT DO UPDATE statement, returning the previous values
+    to version. Otherwise (and for values having a null sfield, which never conflict), rows already
+    in db are retrieved in one query per batch: the absent ones are inserted with a COPY, the other
+    ones updated by a single UPDATE ... FROM VALUES.
+    """
+    db_schema: SQLModelMetaclass = raw_db_schema or data[0].__class__  # type: ignore[assignment]
+    unique, sfields = _has_unique_sfields(db_schema), _get_schema_columns(db_schema)[0]
+
+    for batch in _get_batches(data, verbose):
+        values: list[SQLModel] = [db_schema(**row) if isinstance(row, dict) else row
+                                  for row in batch]
+        if unique:
+            _conflict_upsert([value.model_dump() for value in values
+                              if all(getattr(value, col) is not None for col in sfields)],
+                             session, db_schema, version_id)
+            values = [value for value in values
+                      if any(getattr(value, col) is None for col in sfields)]
+        _select_upsert(values, session, db_schema, version_id)
+        session.commit()
+
+
+def _select_upsert(values: list[SQLModel],
+                   session: Session,
+                   db_schema: SQLModelMetaclass,
+                   version_id: str | None = None
+                   ) -> None:
     """
-    Upsert the passed list of dicts (corresponding to db_schema) into db_schema db.
+    Upsert the passed values by first retrieving (on sfields, matching null ones with IS NULL) the
+    rows already in db: the absent ones are inserted with a COPY, the other ones updated by a
+    single UPDATE ... FROM VALUES, versioning the previous values of the updated versioned columns.
     """
-    db_schema = raw_db_schema or data[0].__class__
+    if not values:
+        return
     selector = partial(upsert_selector, db_schema=db_schema)
-    updator = partial(upsert_updator, db_schema=db_schema, version_id=version_id)
+    new_objects, other_objects = _split_new_values(values, session, db_schema)
+    _copy_values(new_objects, session, db_schema)
+    changes = []
+    updates: dict[int, tuple[SQLModel, dict[str, Any]]] = {}
+    for new_object, in_db in other_objects:
+        if in_db or (in_db := session.exec(selector(new_object)).first()):
+            row_id = in_db.id  # type: ignore[union-attr]
+            current = in_db.model_dump() | updates.get(row_id, (in_db, {}))[1]
+            to_update, row_changes = _get_updates(new_object, current, row_id, db_schema)
+            changes.extend(row_changes)
+            updates[row_id] = (in_db, to_update)
+        else:
+            session.add(new_object)
+    _bulk_update(updates, session, db_schema)
+    _add_versions(changes, session, db_schema, version_id)
+
+
+def upsert_data_trusted(data: list[dict[str, Any]],
+                        session: Session,
+                        db_schema: SQLModelMetaclass,
+                        version_id: str | None = None,
+                        verbose: bool = False) -> None:
+    """
+    Upsert the passed list of dicts into db_schema db, without building a db_schema instance per
+    dict: the dicts are trusted to hold values already suited to db_schema columns (as is the case
+    of upsert_df_data records). Missing columns are filled with their db_schema default.
+
+    NB: only the ON CONFLICT path (sfields backed by a unique constraint) can upsert plain dicts.
+    Otherwise, the upsert falls back to upsert_data. Dicts having a null sfield (never conflicting)
+    are upserted as in upsert_data, matching null sfields with IS NULL.
+    """
+    if not _has_unique_sfields(db_schema):
+        return upsert_data(data, session, raw_db_schema=db_schema, version_id=version_id,
+                           verbose=verbose)
+    sfields = _get_schema_columns(db_schema)[0]
+    for batch in _get_batches(data, verbose):
+        rows = [_complete_row(row, db_schema) for row in batch]
+        _conflict_upsert([row for row in rows if all(row[col] is not None for col in sfields)],
+                         session, db_schema, version_id)
+        _select_upsert([db_schema(**row) for row in rows
+                        if any(row[col] is None for col in sfields)], session, db_schema,
+                       version_id)
+        session.commit()
+
+
+def _get_batches(data: Sequence, verbose: bool) -> Iterable[Sequence]:
+    """
+    Split data in BATCH_SIZE batches, wrapped in a progress bar if verbose
+    """
     batches = [data[i:i + BATCH_SIZE] for i in range(0, len(data), BATCH_SIZE)]
+    return progressbar.progressbar(batches, redirect_stdout=False) if verbose else batches
 
-    for batch in progressbar.progressbar(batches, redirect_stdout=False):
-        for row in batch:
-            new_object = db_schema(**row) if isinstance(row, dict) else row
-            if in_db := session.exec(selector(new_object)).first():
-                session.exec(updator(new_object, in_db.id, session))
-            else:
-                session.add(new_object)
-        session.commit()
+
+def _complete_row(row: dict[str, Any], db_schema: SQLModelMetaclass) -> dict[str, Any]:
+    """
+    Restrict the passed row to db_schema columns, filling the missing ones with their default.
+
+    NB: raises a ValueError if a required (without default) field is missing
+    """
+    fields = db_schema.model_fields  # type: ignore[attr-defined]
+    if missing := [col for col, fld in fields.items() if col not in row and fld.is_required()]:
+        raise ValueError(f'Missing required {db_schema.__name__} fields {missing} in {row}')
+    return {col: row[col] if col in row else fld.get_default(call_default_factory=True)
+            for col, fld in fields.items()}
+
+
+def _split_new_values(values: list[SQLModel],
+                      session: Session,
+                      db_schema: SQLModelMetaclass
+                      ) -> tuple[list[SQLModel], list[tuple[SQLModel, SQLModel | None]]]:
+    """
+    Split the passed values between those (first of their sfields) absent from db and the other
+    ones, paired with their in db row. In db rows are retrieved in one query on sfields.
+
+    NB: values with a null sfield (matched with IS NULL by upsert_selector) or duplicating a new
+    value are paired with None, their in db row (if any) being left to upsert_selector
+    """
+    if not (sfields := get_sfield_columns(db_schema)):
+        return [], [(value, None) for value in values]
+    keys = [tuple(getattr(value, col) for col in sfields) for value in values]
+    key_cols = tuple_(*[getattr(db_schema, col) for col in sfields])
+    query: Any = select(db_schema).where(  # type: ignore[arg-type]
+        key_cols.in_([key for key in keys if None not in key]))
+    in_db = {tuple(getattr(row, col) for col in sfields): row for row in session.exec(query)}
+    new_values: dict[tuple, SQLModel] = {}
+    other_values: list[tuple[SQLModel, SQLModel | None]] = []
+    for key, value in zip(keys, values):
+        if None in key or key in in_db or key in new_values:
+            other_values.append((value, in_db.get(key)))
+        else:
+            new_values[key] = value
+    return list(new_values.values()), other_values
+
+
+def _bulk_update(updates: dict[int, tuple[SQLModel, dict[str, Any]]],
+                 session: Session,
+                 db_schema: SQLModelMetaclass
+                 ) -> None:
+    """
+    Update the passed rows (row_id: (in db row, new values)) of db_schema db with a single
+    UPDATE ... FROM (VALUES ...) statement, expiring the in db rows so that they get reloaded.
+
+    NB: VALUES columns are cast back to their column types, text literals (enums, json...) not
+    being otherwise assignable to them
+    """
+    if not updates:
+        return
+    table = db_schema.__table__  # type: ignore[attr-defined]
+    cols = list(next(iter(updates.values()))[1])
+    new_values = Values(column('id', table.c.id.type),
+                        *[column(col, table.c[col].type) for col in cols], name='new_values'
+                        ).data([(row_id, *[to_update[col] for col in cols])
+                                for row_id, (_, to_update) in updates.items()])
+    session.execute(update(table).where(table.c.id == new_values.c.id).values(
+        {col: cast(new_values.c[col], table.c[col].type) for col in cols}))
+    for in_db, _ in updates.values():
+        session.expire(in_db)
+
+
+def _copy_values(values: list[SQLModel], session: Session, db_schema: SQLModelMetaclass) -> None:
+    """
+    Insert the passed values into db_schema db with a (csv) COPY, in the session transaction.
+
+    NB: as with session.add, the values end up with their db id and attached to the session (hence
+    refreshed from db once expired). To do so, missing ids are first drawn from the id sequence.
+    """
+    if not values:
+        return
+    table = db_schema.__table__  # type: ignore[attr-defined]
+    if missing_ids := [value for value in values if value.id is None]:  # type: ignore[attr-defined]
+        ids = session.execute(text(
+            'SELECT nextval(pg_get_serial_sequence(:table, :col)) FROM generate_series(1, :nb)'),
+            {'table': table.fullname, 'col': 'id', 'nb': len(missing_ids)}).scalars()
+        for value, row_id in zip(missing_ids, ids):
+            value.id = row_id  # type: ignore[attr-defined]
+    arrays = {tbl_col.name for tbl_col in table.columns if isinstance(tbl_col.type, ARRAY)}
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for value in values:
+        writer.writerow([_copy_array(getattr(value, col)) if col in arrays
+                         else _copy_value(getattr(value, col)) for col in table.columns.keys()])
+    buffer.seek(0)
+
+    preparer = session.get_bind().dialect.identifier_preparer
+    dbapi_connection: Any = session.connection().connection  # a psycopg2 connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {preparer.format_table(table)} '
+                           f'({", ".join(preparer.quote(col) for col in table.columns.keys())}) '
+                           'FROM STDIN WITH (FORMAT csv)', buffer)
+    for value in values:
+        if inspect(value, raiseerr=True).transient:
+            make_transient_to_detached(value)
+            session.add(value)
+
+
+def _copy_value(value: Any) -> Any:
+    """
+    Convert the passed value to its COPY csv representation. None is written unquoted (hence
+    read as NULL), strings quoted (hence never read as NULL).
+    """
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, bytes):
+        return f'\\x{value.hex()}'
+    return value
+
+
+def _copy_array(value: Any) -> Any:
+    """
+    Convert the passed (possibly nested) list to its postgres array literal, elements being double
+    quoted (with escaped quotes and backslashes) and None written as NULL.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return '{' + ','.join('NULL' if elt is None else _copy_array(elt) for elt in value) + '}'
+    elt = _copy_value(value)
+    return '"' + str(elt).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+@lru_cache(maxsize=None)
+def _has_unique_sfields(db_schema: SQLModelMetaclass) -> bool:
+    """
+    Whether the db_schema sfields are backed by a unique constraint or index (allowing to upsert
+    with ON CONFLICT on them)
+    """
+    sfields = set(get_sfield_columns(db_schema))
+    table = db_schema.__table__  # type: ignore[attr-defined]
+    uniques = [idx.columns for idx in table.indexes if idx.unique] + [
+        cons.columns for cons in table.constraints if isinstance(cons, UniqueConstraint)]
+    return bool(sfields) and any({col.name for col in cols} == sfields for cols in uniques)
+
+
+def _conflict_upsert(values: list[dict[str, Any]],
+                     session: Session,
+                     db_schema: SQLModelMetaclass,
+                     version_id: str | None = None
+                     ) -> None:
+    """
+    Upsert the passed values (dumped db_schema rows) with a single INSERT ... ON CONFLICT DO UPDATE
+    statement, versioning the previous values of the updated versioned columns.
+
+    NB: the previous values are read from a CTE, which is evaluated on the db state prior to the
+    upsert. Values sharing the same sfields are upserted once, the last one winning. The stored
+    (hence db normalized) new values are returned alongside the previous ones, so that changes are
+    detected on db values only, whatever the form (enum name, string...) of the passed values.
+    """
+    if not values:
+        return
+    table = db_schema.__table__  # type: ignore[attr-defined]
+    sfields, versioned, _ = _get_schema_columns(db_schema)
+    rows = {tuple(value[col] for col in sfields): {
+        col: val for col, val in value.items()
+        if val is not None or col not in table.primary_key.columns} for value in values}
+
+    old = select(table.c.id, *[table.c[col] for col in versioned]).where(
+        tuple_(*[table.c[col] for col in sfields]).in_(list(rows))).cte('old_rows')
+    query = insert(table).values(list(rows.values()))
+    query = query.on_conflict_do_update(
+        index_elements=sfields, set_={col: query.excluded[col] for col in versioned}
+    ) if versioned else query.on_conflict_do_nothing(index_elements=sfields)
+    previous = [select(old.c[col]).where(old.c.id == table.c.id).correlate(table)
+                .scalar_subquery().label(f'old_{col}') for col in ('id', *versioned)]
+    results = session.execute(query.add_cte(old).returning(
+        table.c.id, *[table.c[col] for col in versioned], *previous)).mappings()
+
+    changes = [(result['id'], col, result[f'old_{col}']) for result in results
+               if result['old_id'] is not None for col, differ in _get_differs(db_schema)
+               if differ(result[f'old_{col}'], result[col])]
+    _add_versions(changes, session, db_schema, version_id)
+
+
+def _add_versions(changes: list[tuple[int, str, Any]],
+                  session: Session,
+                  db_schema: SQLModelMetaclass,
+                  version_id: str | None = None
+                  ) -> None:
+    """
+    Store the passed (row_id, column, previous value) versions of db_schema. If a version of the
+    same (row_id, column) already exists for version_id, only its value is updated.
+
+    NB: new versions are inserted by a single (executemany) INSERT, without creating Version
+    instances
+    """
+    col_types = _get_schema_columns(db_schema)[2]
+    table = db_schema.__tablename__
+    row_ids = Version.row_id.in_(list({row_id for row_id, _, _ in changes}))  # type: ignore
+    versions = {(version.row_id, version.column): version for version in session.exec(
+        select(Version).where(Version.table == table, Version.version_id == version_id, row_ids))
+    } if version_id and changes else {}
+
+    new_versions: list[dict[str, Any]] = []
+    new_idx: dict[tuple[int, str], int] = {}
+    for row_id, col, val in changes:
+        if version_db := versions.get((row_id, col)):
+            version_db.value = val
+            continue
+        row = version_row(table, col, row_id, col_types[col], val, version_id)
+        if version_id and (row_id, col) in new_idx:
+            new_versions[new_idx[(row_id, col)]] = row
+        else:
+            new_idx[(row_id, col)] = len(new_versions)
+            new_versions.append(row)
+    if new_versions:
+        session.execute(insert(Version.__table__), new_versions)  # type: ignore[attr-defined]
 
 
 def get_sfield_columns(db_model: SQLModelMetaclass) -> list[str]:
@@ -187,11 +571,20 @@ def get_sfield_columns(db_model: SQLModelMetaclass) -> list[str]:
     Returns:
         list of str with the names of the columns
     """
-    return [
-        x.name
-        for x in inspect(db_model).c
-        if x.info.get(FILTER_ON) is True
-    ]
+    return list(_get_schema_columns(db_model)[0])
+
+
+@lru_cache(maxsize=None)
+def _get_schema_columns(db_schema: SQLModelMetaclass
+                        ) -> tuple[tuple[str, ...], tuple[str, ...], dict[str, Any]]:
+    """
+    Retrieve (once per db_schema) the names of its sfield columns, of its columns to be versioned,
+    as well as its fields types
+    """
+    cols = inspect(db_schema).c
+    return (tuple(col.name for col in cols if col.info.get(FILTER_ON) is True),
+            tuple(col.name for col in cols if col.info.get(FILTER_ON) is False),
+            {name: fld.annotation for name, fld in db_schema.__fields__.items()})
 
 
 def filter_to_sfield_dict(row: dict | SQLModelMetaclass,
@@ -222,20 +615,46 @@ def add_missing_columns(model: Any, session: Session) -> None:
     NB3: possible to index columns, and to add foreign key.
 
     NB4: Possible to have a non NULL default value
+
+    NB5: all the DDL statements are sent in a single multi statement request (and transaction).
+    Default values are passed as parameters, their quoting being left to the driver.
     """
     table = model.__tablename__
     current_cols,  = get_existing_columns(table, session),
+    queries: list[str] = []
+    params: dict[str, Any] = {}
     for col, py_type, fld in [(c, p, f) for c, p, f in _get_cols(model) if c not in current_cols]:
-        is_null = _is_type_nullable(py_type)
+        clean_type, is_null = _analyze_type(py_type)
         default = _get_default_value(fld, is_null)
-        _add_column(table, col, _py_type_to_sql(_clean_py_type(py_type)), default, is_null, session)
+        query, col_params = _add_column(table, col, _py_type_to_sql(clean_type), default, is_null)
+        queries.append(query)
+        params |= col_params
         if getattr(fld, 'index', False):
-            _add_index(table, col, session)
+            queries.append(_add_index(table, col))
         if isinstance((fk := getattr(fld, 'foreign_key', None)), str) and fk.strip():
-            _add_foreign_key(f"{fk.split('.')[0]}(id)", table, col, session)
+            queries.append(_add_foreign_key(f"{fk.split('.')[0]}(id)", table, col))
+    if queries:
+        session.execute(text(';\n'.join(queries)), params)
         session.commit()
 
 
+def add_search_indexes(model: Any, search_cols: list[str], session: Session) -> None:
+    """
+    Create (if not already there) a trigram GIN index on each passed column of the model table, so
+    that the server side search ILIKE '%search_str%' conditions (see db_retrieval) are satisfied by
+    an index scan instead of a full table one.
+
+    NB: requires the pg_trgm extension, created if missing (which needs the corresponding db
+    privileges). All statements are sent in a single multi statement request.
+    """
+    table = model.__tablename__
+    queries = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+        f'CREATE INDEX IF NOT EXISTS ix_{table}_{col}_trgm ON {table} '
+        f'USING gin ({col} gin_trgm_ops)' for col in search_cols]
+    session.execute(text(';\n'.join(queries)))
+    session.commit()
+
+
 def _get_default_value(fld: Any, nullable: bool) -> Any:
     """
     Find if any the field default value
@@ -249,44 +668,50 @@ def _add_column(table: str,
                 col: str,
                 sql_type: str,
                 default: Any,
-                nullable: bool,
-                session: Session
-                ) -> None:
+                nullable: bool
+                ) -> tuple[str, dict[str, Any]]:
     """
-     Add the new column with sql_type to the passed table
+     Statement (and its parameters) adding the new column with sql_type to the passed table
     """
-    session.execute(text(f'ALTER TABLE {table} ADD COLUMN {col} {sql_type} '
-                         f'{_get_additional_request(col, sql_type, default, nullable)}'))
+    additional_request, params = _get_additional_request(col, sql_type, default, nullable)
+    return f'ALTER TABLE {table} ADD COLUMN {col} {sql_type} {additional_request}', params
 
 
-def _get_additional_request(col: str, sql_type: str, default_value: Any, nullable: bool) -> str:
+def _get_additional_request(col: str,
+                            sql_type: str,
+                            default_value: Any,
+                            nullable: bool
+                            ) -> tuple[str, dict[str, Any]]:
     """
-    Add if any the default value for the passed col.
+    Add if any the default value for the passed col, as a bound parameter.
     """
     if nullable:
-        return 'NULL'
+        return 'NULL', {}
 
-    if default_value is not None:
-        if (default_sql := _python_default_to_sql(default_value, sql_type)) == 'NULL':
-            raise ValueError(f'Non-nullable column {col} requires a default_value')
-        return f'DEFAULT {default_sql} NOT NULL'
+    if default_value is None or default_value == PydanticUndefined:
+        raise ValueError(f'Non-nullable column {col} requires a default_value')
 
-    raise ValueError(f'Non-nullable column {col} requires a default_value')
+    param = f'default_{col}'
+    if sql_type == 'JSONB':
+        return f'DEFAULT CAST(:{param} AS JSONB) NOT NULL', {param: json.dumps(default_value)}
+    if isinstance(default_value, enum.Enum):
+        return f'DEFAULT :{param} NOT NULL', {param: default_value.name}
+    return f'DEFAULT :{param} NOT NULL', {param: default_value}
 
 
-def _add_index(table: str, col: str, session: Session):
+def _add_index(table: str, col: str) -> str:
     """
-    Index the new table column
+    Statement indexing the new table column
     """
-    session.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_{col} ON {table} ({col})'))
+    return f'CREATE INDEX IF NOT EXISTS ix_{table}_{col} ON {table} ({col})'
 
 
-def _add_foreign_key(fk: str, table: str, col: str, session: Session):
+def _add_foreign_key(fk: str, table: str, col: str) -> str:
     """
-    Add a fk foreign key on the passed table column
+    Statement adding a fk foreign key on the passed table column
     """
-    session.execute(text(
-        f'ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{col} FOREIGN KEY ({col}) REFERENCES {fk}'))
+    return (f'ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{col} '
+            f'FOREIGN KEY ({col}) REFERENCES {fk}')
 
 
 def _get_cols(model: Any) -> Iterator[tuple[str, Any, Any]]:
@@ -310,56 +735,30 @@ def get_existing_columns(table_name: str, session: Session) -> set[str]:
 def _clean_py_type(col_type: Any) -> Any:
     """
     Convert union and optional types to their non-None types, return directly passed type otherwise.
-    - Handle Python 3.10+ UnionType (aka X | Y)
-    - Unpack Optional types (Union[X, NoneType])
     """
-    if isinstance(col_type, types.UnionType):
-        if len((args := [t for t in col_type.__args__ if t is not type(None)])) == 1:
-            return args[0]
-
-    if get_origin(col_type) is Union:
-        if len((args := [t for t in get_args(col_type) if t is not type(None)])) == 1:
-            return args[0]
-
-    return col_type
+    return _analyze_type(col_type)[0]
 
 
 def _is_type_nullable(col_type: Any) -> bool:
     """
     Return True if col_type is Optional or Union[..., None].
     """
-    if isinstance(col_type, types.UnionType):
-        return type(None) in col_type.__args__
-
-    if get_origin(col_type) is Union:
-        return type(None) in get_args(col_type)
+    return _analyze_type(col_type)[1]
 
-    return col_type is type(None)
 
-
-def _python_default_to_sql(value: Any, sql_type: str) -> str:
+@lru_cache(256)
+def _analyze_type(col_type: Any) -> tuple[Any, bool]:
     """
-    Convert Python default to SQL literal, handling common types.
+    Introspect (once per type) col_type, returning its non-None type (if unique, col_type
+    otherwise) and whether it is nullable.
+    - Handle Python 3.10+ UnionType (aka X | Y)
+    - Unpack Optional types (Union[X, NoneType])
     """
-    if value is None or value == PydanticUndefined:
-        return 'NULL'
-    if sql_type in ('VARCHAR', 'TEXT', 'CHAR'):
-        safe_value = value.replace("'", "''")
-        return f"'{safe_value}'"
-    if sql_type in ('INTEGER', 'FLOAT', 'NUMERIC', 'DOUBLE PRECISION'):
-        return str(value)
-    if sql_type == 'BOOLEAN':
-        return 'TRUE' if value else 'FALSE'
-    if sql_type == 'BYTEA':
-        if isinstance(value, bytes):
-            return f"decode('{value.hex()}', 'hex')"
-        raise ValueError('Default for BYTEA must be bytes')
-    if sql_type == 'JSONB':
-        json_str = json.dumps(value).replace("'", "''")
-        return f"'{json_str}'::jsonb"
-    if isinstance(value, enum.Enum):
-        return f"'{str(value.name)}'"
-    return str(value)
+    if isinstance(col_type, types.UnionType) or get_origin(col_type) is Union:
+        args = get_args(col_type)
+        non_null = [t for t in args if t is not type(None)]
+        return non_null[0] if len(non_null) == 1 else col_type, type(None) in args
+    return col_type, col_type is type(None)
 
 
 def _py_type_to_sql(col_type: type) -> str:
@@ -374,18 +773,8 @@ def _py_type_to_sql(col_type: type) -> str:
     - Enum
     NB: for enum, assumes type is already created in DB
     """
-    if col_type is str:
-        return 'VARCHAR'
-    if col_type is int:
-        return 'INTEGER'
-    if col_type is float:
-        return 'FLOAT'
-    if col_type is bool:
-        return 'BOOLEAN'
-    if col_type is bytes:
-        return 'BYTEA'
-    if col_type is dict:
-        return 'JSONB'
+    if sql_type := _SQL_TYPES.get(col_type):
+        return sql_type
     if hasattr(col_type, '__members__'):
         return col_type.__name__.lower()
     raise ValueError(f'Unsupported column type: {col_type}')
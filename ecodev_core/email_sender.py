@@ -1,12 +1,16 @@
 """
 Module implementing generic email send
 """
+from contextlib import contextmanager
 from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from functools import lru_cache
 from pathlib import Path
 from smtplib import SMTP
 from ssl import create_default_context
+from typing import Any
+from typing import Iterator
 
 from ecodev_core.settings import SETTINGS
 
@@ -21,21 +25,59 @@ def send_email(email: str, body: str, topic: str, images: dict[str, Path] | None
         - topic: the email topic
         - images: if any, the Dict of image tags:image paths to incorporate in the email
     """
+    send_emails([{'email': email, 'body': body, 'topic': topic, 'images': images}])
 
-    SETTINGS.smtp.email_port
+
+def send_emails(jobs: list[dict[str, Any]]) -> None:
+    """
+    Send several emails through a single smtp connection.
+
+    Each job is a dict with the send_email arguments as keys (email, body, topic and optionally
+    images).
+
+    NB: image files are only read once, whatever the number of emails (and jobs) they appear in
+    """
+    with _smtp_connection() as server:
+        for job in jobs:
+            em = _build_message(job['email'], job['body'], job['topic'], job.get('images'))
+            server.sendmail(SETTINGS.smtp.email_sender, job['email'], em.as_string())
+
+
+@contextmanager
+def _smtp_connection() -> Iterator[SMTP]:
+    """
+    Open (and log in) a tls connection to the smtp server
+    """
+    with SMTP(SETTINGS.smtp.email_smtp, SETTINGS.smtp.email_port) as server:
+        server.ehlo()
+        server.starttls(context=create_default_context())
+        server.login(SETTINGS.smtp.email_sender, SETTINGS.smtp.email_password)
+        yield server
+
+
+def _build_message(email: str, body: str, topic: str,
+                   images: dict[str, Path] | None = None) -> MIMEMultipart:
+    """
+    Forge the html email (with its attached images) sent to the passed email
+    """
     em = MIMEMultipart('related')
     em['From'] = SETTINGS.smtp.email_sender
     em['To'] = email
     em['Subject'] = topic
     em.attach(MIMEText(body, 'html'))
     for tag, img_path in (images or {}).items():
-        with open(img_path, 'rb') as fp:
-            img = MIMEImage(fp.read())
+        img = MIMEImage(_read_image(Path(img_path), Path(img_path).stat().st_mtime))
         img.add_header('Content-ID', f'<{tag}>')
         em.attach(img)
+    return em
 
-    with SMTP(SETTINGS.smtp.email_smtp, SETTINGS.smtp.email_port) as server:
-        server.ehlo()
-        server.starttls(context=create_default_context())
-        server.login(SETTINGS.smtp.email_sender, SETTINGS.smtp.email_password)
-        server.sendmail(SETTINGS.smtp.email_sender, email, em.as_string())
+
+@lru_cache(64)
+def _read_image(img_path: Path, mtime: float) -> bytes:
+    """
+    Content of the image at img_path. Keyed by mtime so that a modified image is read again.
+
+    NB: the bytes (and not the MIMEImage) are cached, since each message adds its own headers
+    """
+    with open(img_path, 'rb') as fp:
+        return fp.read()
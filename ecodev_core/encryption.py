@@ -1,6 +1,9 @@
 """
 Module implementing simple fernet AES128 encryption/decryption
 """
+from time import time
+from typing import Iterable
+
 from cryptography.fernet import Fernet
 
 from ecodev_core.settings import SETTINGS
@@ -40,3 +43,22 @@ def decrypt_value(encrypted: bytes):
         Decrypted value as float
     """
     return float(get_fernet().decrypt(encrypted).decode())
+
+
+def encrypt_values(values: Iterable[float]) -> list[bytes]:
+    """
+    Encrypt several values (e.g. a whole column) using Fernet symmetric encryption.
+
+    NB: the tokens are the same as the encrypt_value ones (all stamped with the same time), and can
+    therefore be decrypted one by one with decrypt_value
+    """
+    fernet, now = get_fernet(), int(time())
+    return [fernet.encrypt_at_time(str(value).encode(), now) for value in values]
+
+
+def decrypt_values(encrypted: Iterable[bytes]) -> list[float]:
+    """
+    Decrypt several encrypted values and convert them to floats.
+    """
+    fernet = get_fernet()
+    return [float(fernet.decrypt(token).decode()) for token in encrypted]
@@ -1,10 +1,15 @@
 """
 Module implementing a connection to an elastic search instance, and basic insertion/retrieval.
 """
+import asyncio
+from collections import deque
+from os import cpu_count
 from typing import Any
+from typing import Iterable
 from typing import Union
 
-import progressbar
+from elastic_transport import HttpxAsyncHttpNode
+from elasticsearch import AsyncElasticsearch
 from elasticsearch import Elasticsearch
 from elasticsearch import helpers
 
@@ -12,53 +17,174 @@ from ecodev_core.logger import logger_get
 from ecodev_core.settings import SETTINGS
 
 ES_CLIENT: Union[Elasticsearch, None] = None
+ES_ASYNC_CLIENT: Union[AsyncElasticsearch, None] = None
+ES_ASYNC_LOOP: Union[asyncio.AbstractEventLoop, None] = None
 log = logger_get(__name__)
 ES_BATCH_SIZE = 5000
+ES_CONNECTIONS = max(32, (cpu_count() or 1) * 4)
+INDEXING_SETTINGS = {'refresh_interval': '30s',
+                     'translog': {'durability': 'async', 'flush_threshold_size': '1gb'}}
 
 
 def get_es_client():
     """
     Get the elasticsearch client
+
+    NB: the (shared) client keeps up to ES_CONNECTIONS connections per node, so that concurrent
+    callers (e.g. parallel_bulk threads) do not queue on its pool. Request bodies are gzipped.
     """
     global ES_CLIENT
 
-    host = SETTINGS.elastic_search.host
-    port = SETTINGS.elastic_search.port
-    user = SETTINGS.elastic_search.user
-    password = SETTINGS.elastic_search.password
     if ES_CLIENT is None:
-        ES_CLIENT = Elasticsearch(f'http://{host}:{port}/', basic_auth=[user, password])
+        ES_CLIENT = Elasticsearch(**_get_client_kwargs())
 
     return ES_CLIENT
 
 
-def create_es_index(body: dict, index: str | None = None) -> None:
+def get_es_async_client() -> AsyncElasticsearch:
+    """
+    Get the asyncio elasticsearch client, configured as the get_es_client one. To be called from
+    a running event loop.
+
+    NB: relies on the httpx transport (httpx being already a dependency), not on aiohttp. Its
+    connections being bound to the event loop the client was created on, a new client is created
+    when called from another loop (e.g. a later asyncio.run).
+    """
+    global ES_ASYNC_CLIENT, ES_ASYNC_LOOP
+
+    loop = asyncio.get_running_loop()
+    if ES_ASYNC_CLIENT is None or ES_ASYNC_LOOP is not loop:
+        ES_ASYNC_CLIENT = AsyncElasticsearch(**_get_client_kwargs(), node_class=HttpxAsyncHttpNode)
+        ES_ASYNC_LOOP = loop
+
+    return ES_ASYNC_CLIENT
+
+
+def _get_client_kwargs() -> dict[str, Any]:
+    """
+    Elasticsearch clients (sync or async) connection arguments
+    """
+    es_settings = SETTINGS.elastic_search  # type: ignore[attr-defined]
+    host, port = es_settings.host, es_settings.port
+    user, password = es_settings.user, es_settings.password
+    return {'hosts': f'http://{host}:{port}/', 'basic_auth': (user, password),
+            'connections_per_node': ES_CONNECTIONS, 'http_compress': True}
+
+
+def close_es_client() -> None:
+    """
+    Close the elasticsearch client (and its connection pool), the next get_es_client call creating
+    a new one
+    """
+    global ES_CLIENT
+
+    if ES_CLIENT is not None:
+        ES_CLIENT.close()
+        ES_CLIENT = None
+
+
+async def close_es_async_client() -> None:
+    """
+    Close the asyncio elasticsearch client (and its connection pool), the next get_es_async_client
+    call creating a new one. To be awaited on the event loop the client was used on.
+    """
+    global ES_ASYNC_CLIENT, ES_ASYNC_LOOP
+
+    if ES_ASYNC_CLIENT is not None:
+        await ES_ASYNC_CLIENT.close()
+        ES_ASYNC_CLIENT, ES_ASYNC_LOOP = None, None
+
+
+def create_es_index(body: dict, index: str | None = None, indexing_mode: bool = False) -> None:
     """
     create an es index
+
+    NB: in indexing_mode, the index is tuned for bulk ingestion (INDEXING_SETTINGS): refreshed
+    every 30s and with its translog fsynced asynchronously (an index rebuilt from scratch
+    tolerating the loss of its last seconds of writes on a crash). Settings filled in body take
+    precedence. Call finish_es_indexing once the ingestion is over to restore the default settings.
     """
     client = get_es_client()
-    index = index or SETTINGS.elastic_search.index
+    index = index or SETTINGS.elastic_search.index  # type: ignore[attr-defined]
     try:
         client.indices.delete(index=index)
     except Exception:
         pass
+    if indexing_mode:
+        body = {**body, 'settings': _with_indexing_settings(body.get('settings', {}))}
     client.indices.create(index=index, body=body)
     log.info(f'index {index} created')
 
 
-def insert_es_fields(operations: list[dict],
+def finish_es_indexing(index: str | None = None) -> None:
+    """
+    Restore the default refresh and translog settings of an index created in indexing_mode, and
+    refresh it so that all the ingested documents are searchable
+    """
+    client = get_es_client()
+    index = index or SETTINGS.elastic_search.index  # type: ignore[attr-defined]
+    client.indices.put_settings(index=index, settings={
+        'refresh_interval': None, 'translog': {'durability': None, 'flush_threshold_size': None}})
+    client.indices.refresh(index=index)
+    log.info(f'index {index} indexing finished')
+
+
+def _with_indexing_settings(settings: dict) -> dict:
+    """
+    Complete the passed index settings (flat or nested under index) with INDEXING_SETTINGS
+    """
+    index_settings = settings.get('index', {})
+    defaults = {key: val for key, val in INDEXING_SETTINGS.items()
+                if key not in settings and key not in index_settings}
+    return defaults | settings
+
+
+def insert_es_fields(operations: Iterable[dict],
                      batch_size: int = ES_BATCH_SIZE,
-                     index: str | None = None
+                     index: str | None = None,
+                     thread_count: int = 8,
+                     queue_size: int = 4
                      ) -> None:
     """
     Generic es insertion
+
+    NB: operations are sent by bulk requests of batch_size operations, thread_count of them being
+    in flight at once (and at most queue_size batches waiting for a thread). As with a serial bulk,
+    a failed operation raises a BulkIndexError.
+
+    NB2: operations are consumed lazily, chunk by chunk: they can be passed as a generator, so as
+    not to materialize them all in memory
     """
     client = get_es_client()
-    index = index or SETTINGS.elastic_search.index
-    batches = [list(operations)[i:i + batch_size] for i in range(0, len(operations), batch_size)]
+    index = index or SETTINGS.elastic_search.index  # type: ignore[attr-defined]
+    log.info('indexing fields')
+    deque(helpers.parallel_bulk(client, operations, thread_count=thread_count,
+                                chunk_size=batch_size, queue_size=queue_size, index=index),
+          maxlen=0)
+
+
+async def insert_es_fields_async(operations: list[dict],
+                                 batch_size: int = ES_BATCH_SIZE,
+                                 index: str | None = None,
+                                 concurrency: int = 8
+                                 ) -> None:
+    """
+    Generic es insertion, for callers already running in an event loop.
+
+    NB: operations are sent by bulk requests of batch_size operations, concurrency of them being in
+    flight at once on the asyncio client. A failed operation raises a BulkIndexError.
+    """
+    client = get_es_async_client()
+    index = index or SETTINGS.elastic_search.index  # type: ignore[attr-defined]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _bulk(batch: list[dict]) -> None:
+        async with semaphore:
+            await helpers.async_bulk(client, batch, index=index)
+
     log.info('indexing fields')
-    for batch in progressbar.progressbar(batches, redirect_stdout=False):
-        helpers.bulk(client, batch, index=index)
+    await asyncio.gather(*[_bulk(operations[i:i + batch_size])
+                           for i in range(0, len(operations), batch_size)])
 
 
 def retrieve_es_fields(body: dict[str, Any],
@@ -9,6 +9,10 @@ from enum import unique
 class Permission(str, Enum):
     """
     Enum listing all permission levels an application user can have
+
+    NB: stored in postgres as a native enum type (4 bytes per row, compared by its ordinal), not as
+    a varchar. The db enum labels are the member names (ADMIN, Consultant...), not the string
+    values: both are part of the public contract (the values appearing in users json files)
     """
     ADMIN = 'Admin'
     Consultant = 'Consultant'
@@ -6,13 +6,12 @@ from datetime import timezone
 from typing import Any
 from typing import Optional
 
+import jwt
 import requests
-from jose import jwt
 from pydantic import BaseModel
 
 from ecodev_core import logger_get
-from ecodev_core.authentication import ALGO
-from ecodev_core.authentication import SECRET_KEY
+from ecodev_core.auth_configuration import get_auth
 from ecodev_core.settings import SETTINGS
 
 log = logger_get(__name__)
@@ -74,7 +73,9 @@ class RestApiClient(BaseModel):
             float: Token expiration time.
         """
         try:
-            payload = jwt.decode(self._token.get('access_token'), SECRET_KEY, algorithms=[ALGO])
+            auth = get_auth()
+            payload = jwt.decode(self._token.get('access_token', ''), auth.secret_key,
+                                 algorithms=[auth.algorithm])
             return payload.get('exp', datetime.now(timezone.utc).timestamp())
         except Exception:
             log.warning('Failed to decode token, exp set to current timestamp')
@@ -0,0 +1,67 @@
+"""
+Module implementing a simple thread safe, size bounded, time to live cache
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from typing import Any
+from typing import Hashable
+from typing import Optional
+
+
+class TTLCache:
+    """
+    Thread safe cache whose entries expire ttl seconds after their insertion.
+
+    Attributes are:
+        - maxsize: the maximum number of entries. When full, the least recently used is evicted
+        - ttl: the number of seconds after which an entry is considered expired
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Return the value cached for key if any and not expired, default otherwise
+        """
+        with self._lock:
+            if (item := self._data.get(key)) is None:
+                return default
+            if item[0] <= time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, expire_at: Optional[float] = None) -> None:
+        """
+        Cache value for key. If expire_at (a unix timestamp) is passed and happens before the cache
+        ttl, the entry expires at expire_at instead.
+        """
+        deadline = time() + self.ttl
+        with self._lock:
+            self._data[key] = (deadline if expire_at is None else min(deadline, expire_at), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Remove (if present) the entry cached for key
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all cached entries
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -72,10 +72,24 @@ class Version(SQLModel, table=True):  # type: ignore
         """
         Create a new Version out of the passed information
         """
-        col_type = _col_type_to_db(raw_type)
-        value = _value_to_db(raw_val, col_type)
-        return cls(table=table, column=column, row_id=row_id, col_type=col_type, value=value,
-                   version_id=version_id)
+        return cls(**version_row(table, column, row_id, raw_type, raw_val, version_id))
+
+
+def version_row(table: str,
+                column: str,
+                row_id: int,
+                raw_type: type | EnumType,
+                raw_val: COL_TYPES,
+                version_id: str | None = None
+                ) -> dict:
+    """
+    Forge the Version table row (as a dict of column values, id excluded) out of the passed
+    information. Allows to bulk insert versions without creating Version instances.
+    """
+    col_type = _col_type_to_db(raw_type)
+    return {'created_at': datetime.utcnow(), 'table': table, 'column': column, 'row_id': row_id,
+            'col_type': col_type, 'value': _value_to_db(raw_val, col_type),
+            'version_id': version_id}
 
 
 def get_versions(table: str, column: str, row_id: int, session: Session) -> list[Version]:
@@ -22,6 +22,7 @@ from ecodev_core import get_recent_activities
 from ecodev_core import is_monitoring_user
 from ecodev_core import SafeTestCase
 from ecodev_core import select_user
+from ecodev_core import stream_recent_activities
 from ecodev_core import upsert_app_users
 from ecodev_core.app_activity import get_monthly_activities
 from ecodev_core.authentication import _create_access_token
@@ -127,7 +128,10 @@ class AuthenticationTest(SafeTestCase):
             fastapi_monitor('fastapi', monito, 'test', session)
             dash_monitor('dash', {'token': token}, 'test')
             monitored = get_recent_activities('2024/1/1', session)
+            streamed = list(stream_recent_activities('2024/1/1', session, batch_size=1))
         self.assertEqual((len(monitored)), 2)
+        self.assertEqual({activity.id for activity in streamed},
+                         {activity.id for activity in monitored})
 
     def test_monthly_monitoring(self):
         """
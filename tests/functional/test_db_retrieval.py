@@ -3,6 +3,7 @@ Module testing db retrieval/filtering methods
 """
 from pathlib import Path
 
+from sqlmodel import select
 from sqlmodel import Session
 
 from ecodev_core import AppRight
@@ -11,6 +12,7 @@ from ecodev_core import count_rows
 from ecodev_core import create_db_and_tables
 from ecodev_core import delete_table
 from ecodev_core import engine
+from ecodev_core import get_page
 from ecodev_core import get_rows
 from ecodev_core import SafeTestCase
 from ecodev_core import ServerSideField
@@ -56,3 +58,24 @@ class DbRetrievalTest(SafeTestCase):
         """
         self.assertTrue(count_rows([APP_FILTER], AppUser) == 3)
         self.assertTrue(count_rows([APP_FILTER], AppUser, filter_str='{user} scontains o') == 1)
+
+    def test_get_page(self):
+        """
+        test that the get_page method retrieves both the get_rows page and the count_rows total
+        """
+        rows, count = get_page([APP_FILTER], AppUser, filter_str='{user} scontains i')
+        self.assertTrue(len(rows) == 3 and count == 3)
+        rows, count = get_page([APP_FILTER], AppUser, limit=2, offset=1,
+                               filter_str='{user} scontains i')
+        self.assertTrue(len(rows) == 1 and count == 2)
+        rows, count = get_page([APP_FILTER], AppUser, limit=2, offset=5)
+        self.assertTrue(len(rows) == 0 and count == 2)
+
+    def test_get_rows_after(self):
+        """
+        test that the get_rows keyset pagination retrieves the rows following the passed one
+        """
+        with Session(engine) as session:
+            first = session.exec(select(AppUser).order_by(AppUser.user, AppUser.id)).first()
+        rows = get_rows([APP_FILTER], AppUser, limit=2, after=(first.user, first.id))
+        self.assertTrue(len(rows) == 2 and first.user not in rows['user'].tolist())
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Optional
 
 import pandas as pd
+from sqlalchemy import UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field
 from sqlmodel import inspect
@@ -26,6 +27,7 @@ from ecodev_core import SafeTestCase
 from ecodev_core import sfield
 from ecodev_core import upsert_data
 from ecodev_core import upsert_deletor
+from ecodev_core import upsert_deletor_many
 from ecodev_core import upsert_df_data
 from ecodev_core import Version
 from ecodev_core.db_upsertion import add_missing_columns
@@ -34,6 +36,7 @@ from ecodev_core.db_upsertion import filter_to_sfield_dict
 from ecodev_core.db_upsertion import get_enum_values
 from ecodev_core.db_upsertion import get_existing_columns
 from ecodev_core.db_upsertion import get_sfield_columns
+from ecodev_core.db_upsertion import upsert_data_trusted
 
 
 class UpFoo(SQLModel, table=True):  # type: ignore
@@ -53,6 +56,32 @@ class UpFoo(SQLModel, table=True):  # type: ignore
     bar9: Optional[str] = field(default=None)
 
 
+class UpUniqueFoo(SQLModel, table=True):  # type: ignore
+    """
+    Test class to test db upsertion on sfields backed by a unique constraint
+    """
+    __tablename__ = 'up_unique_foo'
+    __table_args__ = (UniqueConstraint('bar1', 'bar2'),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bar1: str = sfield()
+    bar2: bool = sfield()
+    bar3: str = field()
+    bar4: Permission = field()
+
+
+class UpUniqueEnumFoo(SQLModel, table=True):  # type: ignore
+    """
+    Test class to test db upsertion on enum and nullable sfields backed by a unique constraint
+    """
+    __tablename__ = 'up_unique_enum_foo'
+    __table_args__ = (UniqueConstraint('bar1', 'bar2', 'bar3'),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bar1: str = sfield()
+    bar2: Permission = sfield()
+    bar3: Optional[str] = sfield(default=None)
+    bar4: str = field()
+
+
 NEW_FIELDS = {
     'bar10': (Optional[int], Field(default=None)),
     'bar100': (int, Field(default=0)),
@@ -108,6 +137,8 @@ class UpsertorTest(SafeTestCase):
         super().setUp()
         create_db_and_tables(UpFoo)
         delete_table(UpFoo)
+        delete_table(UpUniqueFoo)
+        delete_table(UpUniqueEnumFoo)
         delete_table(Version)
 
     def test_class_upsertor(self):
@@ -226,6 +257,125 @@ class UpsertorTest(SafeTestCase):
         self.assertEqual(len(foos), 1)
         self.assertEqual(len(versions), 0)
 
+    def test_copy_upsertor_ids(self):
+        """
+        testing that the values inserted by COPY get their db id and are attached to the session
+        """
+        foo = UpFoo(bar1='bar', bar2=True, bar3='bar', bar4=False, bar5=42.42, bar6=42,
+                    bar7=datetime(2025, 3, 17, 3, 4, 5), bar8=Permission.ADMIN)
+        ffoo = UpFoo(bar1='bar', bar2=False, bar3='bbar', bar4=False, bar5=42.42, bar6=42,
+                     bar7=datetime(2025, 3, 17, 3, 4, 5), bar8=Permission.ADMIN)
+
+        with Session(engine) as session:
+            upsert_data([foo, ffoo], session)
+            foos = session.exec(select(UpFoo).order_by(UpFoo.id)).all()
+            self.assertTrue(inspect(foo).persistent)
+            self.assertEqual(foo.bar3, 'bar')
+
+        self.assertEqual([foo.id, ffoo.id], [db_foo.id for db_foo in foos])
+
+    def test_conflict_upsertor(self):
+        """
+        testing db upsertion with ON CONFLICT, on sfields backed by a unique constraint
+        """
+        foo = UpUniqueFoo(bar1='bar', bar2=True, bar3='bar', bar4=Permission.ADMIN)
+        ffoo = UpUniqueFoo(bar1='bar', bar2=False, bar3='bar', bar4=Permission.ADMIN)
+        foo2 = UpUniqueFoo(bar1='bar', bar2=True, bar3='babar', bar4=Permission.ADMIN)
+
+        with Session(engine) as session:
+            upsert_data([foo, ffoo], session)
+            upsert_data([foo2, ffoo], session)
+            foos = session.exec(select(UpUniqueFoo).order_by(UpUniqueFoo.id)).all()
+            versions = get_row_versions('up_unique_foo', foos[0].id, session)
+            other_versions = get_row_versions('up_unique_foo', foos[1].id, session)
+
+        self.assertEqual(len(foos), 2)
+        self.assertEqual(foos[0].bar3, 'babar')
+        self.assertEqual(len(versions), 1)
+        self.assertEqual(versions[0].column, 'bar3')
+        self.assertEqual(versions[0].value, 'bar')
+        self.assertEqual(len(other_versions), 0)
+
+    def test_conflict_df_upsertor(self):
+        """
+        testing db upsertion with ON CONFLICT of a df holding enum names as strings and null sfields
+        """
+        df = pd.DataFrame([{'bar1': 'bar', 'bar2': 'ADMIN', 'bar3': None, 'bar4': 'bar'},
+                           {'bar1': 'bar', 'bar2': 'Client', 'bar3': 'bar', 'bar4': 'bar'}])
+        new_df = df.assign(bar4='babar')
+
+        with Session(engine) as session:
+            upsert_df_data(df, UpUniqueEnumFoo, session)
+            upsert_df_data(new_df, UpUniqueEnumFoo, session)
+            foos = session.exec(select(UpUniqueEnumFoo).order_by(UpUniqueEnumFoo.id)).all()
+            versions = [get_row_versions('up_unique_enum_foo', foo.id, session) for foo in foos]
+
+        self.assertEqual(len(foos), 2)
+        self.assertEqual({foo.bar2 for foo in foos}, {Permission.ADMIN, Permission.Client})
+        self.assertTrue(all(foo.bar4 == 'babar' for foo in foos))
+        self.assertEqual([len(foo_versions) for foo_versions in versions], [1, 1])
+        self.assertTrue(all(foo_versions[0].value == 'bar' for foo_versions in versions))
+
+    def test_trusted_upsertor(self):
+        """
+        testing db upsertion of plain dicts, without building a db_schema instance per dict
+        """
+        foo = {'bar1': 'bar', 'bar2': True, 'bar3': 'bar', 'bar4': Permission.ADMIN}
+        foo2 = {'bar1': 'bar', 'bar2': True, 'bar3': 'babar', 'bar4': Permission.ADMIN}
+
+        with Session(engine) as session:
+            upsert_data_trusted([foo], session, UpUniqueFoo)
+            upsert_data_trusted([foo2], session, UpUniqueFoo)
+            foos = session.exec(select(UpUniqueFoo)).all()
+            versions = get_row_versions('up_unique_foo', foos[0].id, session)
+
+        self.assertEqual(len(foos), 1)
+        self.assertEqual(foos[0].bar3, 'babar')
+        self.assertEqual(len(versions), 1)
+        self.assertEqual(versions[0].value, 'bar')
+
+    def test_trusted_upsertor_strings(self):
+        """
+        testing trusted db upsertion of dicts holding strings (as read from files), defaults being
+        filled and missing required fields rejected
+        """
+        foo = {'bar1': 'bar', 'bar2': 'ADMIN', 'bar4': 'bar'}
+        foo2 = {'bar1': 'bar', 'bar2': 'ADMIN', 'bar3': None, 'bar4': 'babar'}
+
+        with Session(engine) as session:
+            upsert_data_trusted([foo], session, UpUniqueEnumFoo)
+            upsert_data_trusted([foo2], session, UpUniqueEnumFoo)
+            foos = session.exec(select(UpUniqueEnumFoo)).all()
+            versions = get_row_versions('up_unique_enum_foo', foos[0].id, session)
+            with self.assertRaises(ValueError):
+                upsert_data_trusted([{'bar1': 'bar', 'bar2': 'ADMIN'}], session, UpUniqueEnumFoo)
+
+        self.assertEqual(len(foos), 1)
+        self.assertEqual(foos[0].bar2, Permission.ADMIN)
+        self.assertEqual(foos[0].bar4, 'babar')
+        self.assertEqual(len(versions), 1)
+
+    def test_deletor_many(self):
+        """
+        testing the deletion of several rows (and their versions) at once
+        """
+        foo = UpUniqueFoo(bar1='bar', bar2=True, bar3='bar', bar4=Permission.ADMIN)
+        ffoo = UpUniqueFoo(bar1='bar', bar2=False, bar3='bar', bar4=Permission.ADMIN)
+        fffoo = UpUniqueFoo(bar1='babar', bar2=False, bar3='bar', bar4=Permission.ADMIN)
+        foo2 = UpUniqueFoo(bar1='bar', bar2=True, bar3='babar', bar4=Permission.ADMIN)
+
+        with Session(engine) as session:
+            upsert_data([foo, ffoo, fffoo], session)
+            upsert_data([foo2], session)
+            foo_id = session.exec(select(UpUniqueFoo.id).where(UpUniqueFoo.bar2)).first()
+            upsert_deletor_many([foo2, ffoo], session)
+            foos = session.exec(select(UpUniqueFoo)).all()
+            versions = get_row_versions('up_unique_foo', foo_id, session)
+
+        self.assertEqual(len(foos), 1)
+        self.assertEqual(foos[0].bar1, 'babar')
+        self.assertEqual(len(versions), 0)
+
     def test_datetime(self):
         """
         Testing DB insertion for datetime fields
@@ -5,7 +5,9 @@ from cryptography.fernet import InvalidToken
 
 from ecodev_core import SafeTestCase
 from ecodev_core.encryption import decrypt_value
+from ecodev_core.encryption import decrypt_values
 from ecodev_core.encryption import encrypt_value
+from ecodev_core.encryption import encrypt_values
 
 
 class EncryptionTest(SafeTestCase):
@@ -22,6 +24,16 @@ class EncryptionTest(SafeTestCase):
         decrypted = decrypt_value(encrypted)
         self.assertEqual(decrypted, original_value)
 
+    def test_encrypt_decrypt_values(self):
+        """
+        Test encrypting and decrypting several values at once, consistently with the scalar api
+        """
+        original_values = [3.14159, -2.0, 0.0]
+        encrypted = encrypt_values(original_values)
+        self.assertEqual(decrypt_values(encrypted), original_values)
+        self.assertEqual(decrypt_value(encrypted[0]), original_values[0])
+        self.assertEqual(decrypt_values([encrypt_value(1.5)]), [1.5])
+
     def test_decrypt_invalid_data(self):
         """
         Test decrypting invalid encrypted data raises InvalidToken
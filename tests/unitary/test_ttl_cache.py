@@ -0,0 +1,61 @@
+"""
+Module testing the time to live cache
+"""
+import time
+import unittest
+
+from ecodev_core import TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+    """
+    Class testing the time to live cache
+    """
+
+    def test_get_set(self):
+        """
+        test that a cached value is retrieved, and a missing one falls back to default
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b', 2), 2)
+
+    def test_expiration(self):
+        """
+        test that entries expire after the ttl, or earlier if an expiration date is passed
+        """
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set('a', 1)
+        long_cache = TTLCache(maxsize=2, ttl=60)
+        long_cache.set('a', 1, expire_at=time.time() - 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(long_cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_eviction(self):
+        """
+        test that the least recently used entry is evicted when the cache is full
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_pop_clear(self):
+        """
+        test that entries can be invalidated one by one or all together
+        """
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.pop('a')
+        cache.pop('missing')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)